@@ -1,27 +1,130 @@
 import os
 from dotenv import load_dotenv
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Literal, Sequence, Set
 from langchain_openai import ChatOpenAI
 from langchain.schema import HumanMessage, SystemMessage
-import json
+from pydantic import BaseModel, Field
+from http_client import shared_async_http_client, llm_semaphore, llm_max_retries
 import random
+import asyncio
+import functools
+from collections import OrderedDict
+from itertools import islice
+
+# --- Structured Output Schemas ---
+class QuizRecommendation(BaseModel):
+    trigger_quiz: bool
+    reasoning: str = Field(description="Explanation of the quiz recommendation")
+
+class ConceptAssessment(BaseModel):
+    key_concepts: List[str] = Field(description="Key concepts being discussed")
+    understanding_levels: Dict[str, Literal["low", "medium", "high"]] = Field(
+        description="Understanding level for each key concept"
+    )
+    quiz_recommendation: QuizRecommendation
+
+class QuizOption(BaseModel):
+    id: Literal["a", "b", "c", "d"]
+    text: str
+
+class MCQQuestion(BaseModel):
+    id: str = Field(description="Question id such as q1, q2, ...")
+    question: str
+    options: List[QuizOption] = Field(description="Exactly four options with ids a, b, c and d")
+    correct_answer: Literal["a", "b", "c", "d"]
+    explanation: str = Field(description="Detailed explanation of the correct answer")
+
+class MCQQuiz(BaseModel):
+    quiz_title: str
+    questions: List[MCQQuestion] = Field(description="Exactly 5 multiple-choice questions")
+
+# Static system prompts, built once so every call sends the identical message
+_ASSESSMENT_SYSTEM_MSG = SystemMessage(content="""You are an AI Teaching Assistant monitoring student understanding.
+                
+                IMPORTANT: 
+                - If ANY concept understanding is 'high' or 'medium', recommend triggering a quiz
+                - This helps verify readiness to move forward
+                - Students with medium understanding should get a chance to prove their knowledge
+                
+                Carefully analyze the conversation history and current slide content to:
+                1. Identify the key concepts being discussed
+                2. Assess the student's level of understanding
+                3. Determine if a quiz should be triggered""")
+
+_QUIZ_SYSTEM_MSG = SystemMessage(content="""You are an AI Teaching Assistant creating a Multiple Choice Quiz.
+                
+                Generate a quiz that:
+                1. Covers the key concepts in the slide content
+                2. Has 5 multiple-choice questions
+                3. Includes varied difficulty levels
+                4. Provides correct answers and explanations
+                
+                Ensure the quiz is educational and helps reinforce learning.""")
+
+# Generated quizzes keyed by normalized slide content + concepts (LRU). Module-level so
+# every session's assistant shares it; the quiz prompt does not depend on the session.
+_QUIZ_CACHE: OrderedDict[str, Dict[str, Any]] = OrderedDict()
+_QUIZ_CACHE_SIZE = 1024
 
 class AITeachingAssistant:
     def __init__(self, professor_name: str):
         # Load environment variables
         load_dotenv()
         
-        # Initialize OpenAI API
-        self.llm = ChatOpenAI(
-            temperature=0.7,
-            model="gpt-4o-mini",
-            streaming=False
-        )
+        # Shared OpenAI client + schema-bound runnables (built once per process)
+        self.llm, self.assessment_llm, self.quiz_llm = self._shared_llms()
         self.professor_name = professor_name
         
         # Tracking understanding and quiz readiness
         self.concept_understanding: Dict[str, float] = {}
         self.quiz_threshold = 0.7  # 70% understanding triggers quiz
+        
+        # Only the most recent turns are sent to the model for assessment
+        self.history_window = 6
+        
+        # Slides already quizzed this session (see run_quiz_interaction)
+        self.quizzed_slides: Set[str] = set()
+    
+    def reset(self):
+        """Clear per-session state so the assistant can serve a new session"""
+        self.concept_understanding.clear()
+        self.quizzed_slides.clear()
+    
+    @classmethod
+    @functools.cache
+    def _shared_llms(cls):
+        """Build the LLM and its structured-output runnables once per class, not per instance"""
+        # Short structured JSON only, so keep it deterministic
+        llm = ChatOpenAI(
+            temperature=0,
+            model="gpt-4o-mini",
+            streaming=False,
+            http_async_client=shared_async_http_client(),
+            max_retries=llm_max_retries()
+        )
+        # Schema-bound runnables: the API returns validated objects, no json.loads.
+        # The quiz uses strict structured outputs, so the reply always matches MCQQuiz;
+        # ConceptAssessment's free-form dict cannot be expressed in strict mode.
+        return (
+            llm,
+            llm.with_structured_output(ConceptAssessment, method="function_calling"),
+            llm.with_structured_output(MCQQuiz, method="json_schema", strict=True),
+        )
+    
+    @staticmethod
+    def _quiz_cache_key(slide_content: str, key_concepts: List[str]) -> str:
+        """Normalize case/whitespace so near-identical requests share a cache entry"""
+        concepts = sorted(" ".join(c.lower().split()) for c in key_concepts)
+        return " ".join(slide_content.lower().split()) + "|" + "|".join(concepts)
+    
+    def _format_history_tail(self, conversation_history: Sequence[Dict[str, Any]]) -> str:
+        """Render the last few conversation entries as compact prompt lines"""
+        # islice rather than slicing so bounded deques work as well as lists
+        tail = islice(conversation_history, max(len(conversation_history) - self.history_window, 0), None)
+        return "\n".join(
+            f"Page {entry.get('page', 'N/A')} - {entry['role']}: {entry['content']}"
+            for entry in tail
+        )
     
     async def assess_concept_understanding(self, 
                                         conversation_history: List[Dict[str, Any]], 
@@ -31,40 +134,17 @@ class AITeachingAssistant:
         """
         try:
             messages = [
-                SystemMessage(content=f"""You are an AI Teaching Assistant monitoring student understanding.
-                
-                IMPORTANT: 
-                - If ANY concept understanding is 'high' or 'medium', recommend triggering a quiz
-                - This helps verify readiness to move forward
-                - Students with medium understanding should get a chance to prove their knowledge
-                
-                Carefully analyze the conversation history and current slide content to:
-                1. Identify the key concepts being discussed
-                2. Assess the student's level of understanding
-                3. Determine if a quiz should be triggered"""),
+                _ASSESSMENT_SYSTEM_MSG,
                 
-                HumanMessage(content=f"""Conversation History:
-                {json.dumps(conversation_history, indent=2)}
+                HumanMessage(content=f"""Recent Conversation:
+                {self._format_history_tail(conversation_history)}
                 
                 Current Slide Content:
-                {current_slide_content}
-                
-                Respond with this exact structure:
-                {{
-                    "key_concepts": ["concept1", "concept2"],
-                    "understanding_levels": {{
-                        "concept1": "low/medium/high",
-                        "concept2": "low/medium/high"
-                    }},
-                    "quiz_recommendation": {{
-                        "trigger_quiz": true/false,
-                        "reasoning": "explanation of quiz recommendation"
-                    }}
-                }}""")
+                {current_slide_content}""")
             ]
             
-            response = await self.llm.ainvoke(messages)
-            assessment = json.loads(response.content)
+            async with llm_semaphore():
+                assessment = (await self.assessment_llm.ainvoke(messages)).model_dump()
             
             # Trigger quiz for medium or high understanding
             if any(level in ["high", "medium"] for level in assessment['understanding_levels'].values()):
@@ -85,58 +165,44 @@ class AITeachingAssistant:
             }
 
     
-    async def generate_mcq_quiz(self, slide_content: str, key_concepts: List[str]) -> Dict[str, Any]:
+    async def generate_mcq_quiz(self, slide_content: str, key_concepts: List[str],
+                                retake: bool = False) -> Dict[str, Any]:
         """
         Generate a Multiple Choice Questionnaire based on the slide content
         
         Args:
             slide_content (str): Content of the current slide
             key_concepts (List[str]): Key concepts to be tested
+            retake (bool): The student was already quizzed on this slide and has seen
+                the answers, so a new quiz is generated instead of reusing the cached one
         
         Returns:
             Dict containing the MCQ quiz
         """
+        key = self._quiz_cache_key(slide_content, key_concepts)
+        if not retake and key in _QUIZ_CACHE:
+            _QUIZ_CACHE.move_to_end(key)
+            return _QUIZ_CACHE[key]
+        
         try:
             messages = [
-                SystemMessage(content=f"""You are an AI Teaching Assistant creating a Multiple Choice Quiz.
-                
-                Generate a quiz that:
-                1. Covers the key concepts in the slide content
-                2. Has 5 multiple-choice questions
-                3. Includes varied difficulty levels
-                4. Provides correct answers and explanations
-                
-                Ensure the quiz is educational and helps reinforce learning."""),
+                _QUIZ_SYSTEM_MSG,
                 
                 HumanMessage(content=f"""Slide Content:
                 {slide_content}
                 
                 Key Concepts to Test:
-                {', '.join(key_concepts)}
-                
-                Respond with this exact structure:
-                {{
-                    "quiz_title": "Quiz Title",
-                    "questions": [
-                        {{
-                            "id": "q1",
-                            "question": "Question text",
-                            "options": [
-                                {{"id": "a", "text": "Option A"}},
-                                {{"id": "b", "text": "Option B"}},
-                                {{"id": "c", "text": "Option C"}},
-                                {{"id": "d", "text": "Option D"}}
-                            ],
-                            "correct_answer": "a/b/c/d",
-                            "explanation": "Detailed explanation of the correct answer"
-                        }}
-                        // 4 more questions following the same structure
-                    ]
-                }}""")
+                {', '.join(key_concepts)}""")
             ]
             
-            response = await self.llm.ainvoke(messages)
-            return json.loads(response.content)
+            async with llm_semaphore():
+                quiz = (await self.quiz_llm.ainvoke(messages)).model_dump()
+            
+            _QUIZ_CACHE[key] = quiz
+            if len(_QUIZ_CACHE) > _QUIZ_CACHE_SIZE:
+                _QUIZ_CACHE.popitem(last=False)
+            
+            return quiz
         
         except Exception as e:
             print(f"Error generating MCQ quiz: {e}")
@@ -225,14 +291,20 @@ class AITeachingAssistant:
         
         return recommendations.get(performance_level, "Unable to generate specific recommendation.")
 
-async def run_quiz_interaction(teaching_assistant, professor, current_slide):
-    """Run the quiz interaction process"""
+async def run_quiz_interaction(teaching_assistant, professor, current_slide,
+                               understanding_assessment: Optional[Dict[str, Any]] = None):
+    """Run the quiz interaction process
+    
+    Pass understanding_assessment if it was already computed (e.g. concurrently
+    with the professor's evaluation) to skip assessing again.
+    """
     try:
         # Assess concept understanding
-        understanding_assessment = await teaching_assistant.assess_concept_understanding(
-            professor.conversation_history, 
-            current_slide['content']
-        )
+        if understanding_assessment is None:
+            understanding_assessment = await teaching_assistant.assess_concept_understanding(
+                professor.conversation_history, 
+                current_slide.content
+            )
         
         # Check if quiz should be triggered based on understanding level
         understanding_sufficient = any(
@@ -245,22 +317,24 @@ async def run_quiz_interaction(teaching_assistant, professor, current_slide):
             print("\n--- Quiz Time! ---")
             
             # Generate and run quiz...
+            retake = current_slide.content in teaching_assistant.quizzed_slides
+            teaching_assistant.quizzed_slides.add(current_slide.content)
             quiz = await teaching_assistant.generate_mcq_quiz(
-                current_slide['content'], 
-                understanding_assessment['key_concepts']
+                current_slide.content, 
+                understanding_assessment['key_concepts'],
+                retake=retake
             )
             
-            # Present Quiz to Student
+            # Present Quiz to Student, one write per question rather than one per line
             print(f"\nQuiz: {quiz['quiz_title']}")
             student_answers = {}
             
             for question in quiz['questions']:
-                print(f"\n{question['question']}")
-                for option in question['options']:
-                    print(f"{option['id']}. {option['text']}")
+                print("\n".join([f"\n{question['question']}",
+                                 *(f"{option['id']}. {option['text']}" for option in question['options'])]))
                 
                 while True:
-                    answer = input("\nYour answer (a/b/c/d): ").strip().lower()
+                    answer = (await asyncio.to_thread(input, "\nYour answer (a/b/c/d): ")).strip().lower()
                     if answer in ['a', 'b', 'c', 'd']:
                         student_answers[question['id']] = answer
                         break
@@ -269,20 +343,17 @@ async def run_quiz_interaction(teaching_assistant, professor, current_slide):
             # Evaluate Quiz Performance
             performance = await teaching_assistant.evaluate_quiz_performance(quiz, student_answers)
             
-            # Print Quiz Results
-            print("\n--- Quiz Results ---")
-            print(f"Score: {performance['score_percentage']:.2f}%")
-            print(f"Performance Level: {performance['performance_level']}")
-            
             # Determine if we can move to next slide based on performance
             can_move_forward = performance['score_percentage'] >= 70  # 70% threshold
             
-            if can_move_forward:
-                print("\nExcellent work! You're ready to move to the next slide.")
-                return performance
-            else:
-                print("\nLet's review this material a bit more before moving on.")
-                return None
+            # Print Quiz Results
+            print("\n--- Quiz Results ---\n"
+                  f"Score: {performance['score_percentage']:.2f}%\n"
+                  f"Performance Level: {performance['performance_level']}\n"
+                  + ("\nExcellent work! You're ready to move to the next slide." if can_move_forward
+                     else "\nLet's review this material a bit more before moving on."))
+            
+            return performance if can_move_forward else None
             
         else:
             print("\nNot ready for quiz yet. Continue exploring the concept.")
@@ -2,14 +2,18 @@ from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse, FileResponse
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple, Callable, Awaitable
+from collections import OrderedDict
 import uuid
 import os
 import io
+import orjson
+import asyncio
 from gtts import gTTS
 from main import AIProfessor, PROFESSOR_PROFILES, SlideContent
 from extract_info_from_upload import process_document
 from ai_teaching_assistant import AITeachingAssistant
+from http_client import close_shared_async_http_client
 
 # Create FastAPI app instance
 app = FastAPI(
@@ -82,9 +86,36 @@ class ChatResponse(BaseModel):
     verification_question: str = ""
     key_points: List[str] = []
 
+@app.on_event("shutdown")
+async def close_http_client():
+    """Release the shared OpenAI connection pool"""
+    await close_shared_async_http_client()
+
 # --- In-Memory "Database" ---
 file_data: Dict[str, Dict[str, Any]] = {}
 
+# Next-page explanations started when a page is served, so they generate while the
+# student reads and answers; keyed by (object_id, page) and consumed by a later /chat
+_pending_explanations: "OrderedDict[Tuple[str, int], asyncio.Future]" = OrderedDict()
+_PENDING_EXPLANATIONS_SIZE = 1024
+# Cap on in-flight prefetches across all sessions (PREFETCH_CONCURRENCY), separate from the CLI's
+_PREFETCH_LIMIT = asyncio.Semaphore(int(os.getenv("PREFETCH_CONCURRENCY", "16")))
+
+def _stash_prefetch(object_id: str, page: int, future: Optional[asyncio.Future]):
+    if future is None:
+        return
+    _pending_explanations[(object_id, page)] = future
+    if len(_pending_explanations) > _PENDING_EXPLANATIONS_SIZE:
+        _pending_explanations.popitem(last=False)[1].cancel()
+
+def _prefetch_for_next_request(ai_professor: AIProfessor, object_id: str, slides, page: int):
+    """Start explaining `page` now so the request that moves there finds it ready"""
+    slide = slides.get(page)
+    if slide is None or (object_id, page) in _pending_explanations:
+        return
+    ai_professor.prefetch_explanation(slide.content, page, _PREFETCH_LIMIT)
+    _stash_prefetch(object_id, page, ai_professor.detach_prefetched_explanation(page))
+
 # --- Helper Functions ---
 async def get_ai_professor(professor_name: str) -> AIProfessor:
     """Dependency to get an AIProfessor instance."""
@@ -99,21 +130,30 @@ def save_uploaded_file(file: UploadFile, object_id: str):
         buffer.write(file.file.read())
     return file_path
 
+def _synthesize_speech(text: str) -> str:
+    """Blocking gTTS request + file write; returns the audio URL."""
+    tts = gTTS(text)
+    audio_stream = io.BytesIO()
+    tts.save(audio_stream)
+    audio_stream.seek(0)
+
+    audio_filename = f"{uuid.uuid4()}.mp3"
+    audio_filepath = os.path.join("audio", audio_filename)
+    os.makedirs("audio", exist_ok=True)
+
+    with open(audio_filepath, "wb") as f:
+        f.write(audio_stream.read())
+    return f"/audio/{audio_filename}"
+
+def _write_processed_content(path: str, contents):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n\n'.join(contents) if isinstance(contents, list) else contents)
+
 async def convert_text_to_speech_and_get_url(text: str) -> str:
     """Converts text to speech, saves audio, and returns URL."""
     try:
-        tts = gTTS(text)
-        audio_stream = io.BytesIO()
-        tts.save(audio_stream)
-        audio_stream.seek(0)
-
-        audio_filename = f"{uuid.uuid4()}.mp3"
-        audio_filepath = os.path.join("audio", audio_filename)
-        os.makedirs("audio", exist_ok=True)
-
-        with open(audio_filepath, "wb") as f:
-            f.write(audio_stream.read())
-        return f"/audio/{audio_filename}"
+        # gTTS does a synchronous HTTP round trip; keep it off the event loop
+        return await asyncio.to_thread(_synthesize_speech, text)
     except Exception as e:
         print(f"Text-to-speech conversion failed: {e}")
         raise HTTPException(status_code=500, detail="Text-to-speech conversion failed.")
@@ -132,29 +172,26 @@ async def upload_file(
 ):
     """Uploads a file and initializes the conversation."""
     object_id = str(uuid.uuid4())
-    file_path = save_uploaded_file(file, object_id)
+    # File I/O and PDF extraction block, so they run on worker threads
+    file_path = await asyncio.to_thread(save_uploaded_file, file, object_id)
     processed_content_path = os.path.join("processed_content", f"{object_id}.txt")
     os.makedirs("processed_content", exist_ok=True)
 
     try:
-        contents = process_document(file_path)
-        
-        with open(processed_content_path, 'w', encoding='utf-8') as f:
-            f.write('\n\n'.join(contents) if isinstance(contents, list) else contents)
-
-        with open(processed_content_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        contents = await asyncio.to_thread(process_document, file_path)
+        await asyncio.to_thread(_write_processed_content, processed_content_path, contents)
 
         ai_professor = AIProfessor(professor_name)
-        slides = ai_professor.parse_slides(content)
+        slides = await asyncio.to_thread(ai_professor.load_slide_index, processed_content_path)
         num_pages = len(slides)
 
         if not 1 <= start_page <= num_pages:
             raise HTTPException(status_code=400, detail="Invalid start_page")
 
         ai_professor.current_page = start_page
-        first_slide = next(slide for slide in slides if slide['page_number'] == start_page)
-        explanation = await ai_professor.explain_slide(first_slide['content'], start_page)
+        first_slide = slides[start_page]
+        explanation = await ai_professor.explain_slide(first_slide.content, start_page)
+        _prefetch_for_next_request(ai_professor, object_id, slides, start_page + 1)
         audio_url = await convert_text_to_speech_and_get_url(explanation['prof_response']['explanation'])
 
         file_data[object_id] = {
@@ -164,6 +201,7 @@ async def upload_file(
             "professor_name": professor_name,
             "conversation_history": ai_professor.conversation_history,
             "previous_explanations": ai_professor.previous_explanations,
+            "conversation_summary": ai_professor.conversation_summary,
             "num_pages": num_pages,
             "quiz_results": []
         }
@@ -181,77 +219,186 @@ async def upload_file(
         print(f"Error during upload/initialization: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/chat", response_model=ChatResponse)
-async def continue_chat(request: ChatRequest):
-    """Continues the chat conversation."""
-    if request.object_id not in file_data:
-        raise HTTPException(status_code=404, detail="File not found.")
-
+def _ndjson_response(run: Callable[[Callable[[str, str], None]], Awaitable[Dict[str, Any]]],
+                     error_message: str) -> StreamingResponse:
+    """Streams run(on_token) as NDJSON events.
+
+    Each on_token(field, text) call becomes a {"field": ..., "text": ...} line; the
+    dict run returns is sent last as {"done": true, ...}, or {"error": ...} if it raised.
+    Generation is cancelled if the client disconnects.
+    """
+    events: asyncio.Queue = asyncio.Queue()
+
+    async def generate():
+        try:
+            result = await run(lambda field, text: events.put_nowait({"field": field, "text": text}))
+            events.put_nowait({"done": True, **result})
+        except HTTPException as e:
+            events.put_nowait({"error": e.detail})
+        except Exception as e:
+            print(f"{error_message}: {e}")
+            events.put_nowait({"error": str(e)})
+        finally:
+            events.put_nowait(None)
+
+    async def ndjson():
+        task = asyncio.create_task(generate())
+        try:
+            while (event := await events.get()) is not None:
+                yield orjson.dumps(event) + b"\n"
+        finally:
+            task.cancel()  # client disconnected early
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+async def _chat_turn(request: ChatRequest,
+                     on_token: Optional[Callable[[str, str], None]] = None) -> ChatResponse:
+    """Evaluates the student's reply and explains the page they land on.
+
+    If on_token is given, the evaluation feedback and the explanation text are
+    streamed to it as they are generated.
+    """
     file_info = file_data[request.object_id]
     processed_content_path = file_info["processed_content_path"]
 
-    try:
-        with open(processed_content_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+    ai_professor = AIProfessor(file_info["professor_name"])
+    ai_professor.conversation_history = file_info["conversation_history"]
+    ai_professor.previous_explanations = file_info["previous_explanations"]
+    ai_professor.conversation_summary = file_info.get("conversation_summary", {})
+    ai_professor.current_page = request.current_page
 
-        ai_professor = AIProfessor(file_info["professor_name"])
-        ai_professor.conversation_history = file_info["conversation_history"]
-        ai_professor.previous_explanations = file_info["previous_explanations"]
-        ai_professor.current_page = request.current_page
+    # Ensure teaching assistant is initialized
+    await ai_professor.ensure_teaching_assistant()
 
-        # Ensure teaching assistant is initialized
-        await ai_professor.ensure_teaching_assistant()
+    slides = await asyncio.to_thread(ai_professor.load_slide_index, processed_content_path)
 
-        slides = ai_professor.parse_slides(content)
+    if not 1 <= request.current_page <= len(slides):
+        raise HTTPException(status_code=400, detail="Invalid current_page")
 
-        if not 1 <= request.current_page <= len(slides):
-            raise HTTPException(status_code=400, detail="Invalid current_page")
+    current_slide = slides.get(request.current_page)
+    if not current_slide:
+        raise HTTPException(status_code=400, detail=f"Slide {request.current_page} not found.")
 
-        current_slide = next((slide for slide in slides if slide['page_number'] == request.current_page), None)
-        if not current_slide:
-            raise HTTPException(status_code=400, detail=f"Slide {request.current_page} not found.")
-
-        understanding = await ai_professor.evaluate_understanding(current_slide['content'], request.message)
-
-        if understanding['recommended_action'] == 'next':
-            ai_professor.current_page += 1
-
-        if ai_professor.current_page > len(slides):
-            file_data[request.object_id]["conversation_history"] = ai_professor.conversation_history
-            file_data[request.object_id]["previous_explanations"] = ai_professor.previous_explanations
-
-            return ChatResponse(
-                message="End of conversation.",
-                current_page=request.current_page,
-                understanding_assessment=understanding,
-                audio_url="",
-                end_of_conversation=True,
-                verification_question="",
-                key_points=[]
-            )
-        
-        current_slide = next((slide for slide in slides if slide['page_number'] == ai_professor.current_page), None)
-        if not current_slide:
-            raise HTTPException(status_code=400, detail=f"Slide {ai_professor.current_page} not found.")
-        
-        response = await ai_professor.explain_slide(current_slide['content'], ai_professor.current_page)
-        audio_url = await convert_text_to_speech_and_get_url(response['prof_response']['explanation'])
+    # The next page's explanation was usually started when this page was served;
+    # otherwise start it now so it overlaps the evaluation
+    next_page = request.current_page + 1
+    next_slide = slides.get(next_page)
+    if next_slide:
+        pending = _pending_explanations.pop((request.object_id, next_page), None)
+        if pending is not None:
+            ai_professor.adopt_prefetched_explanation(next_page, pending)
+        else:
+            ai_professor.prefetch_explanation(next_slide.content, next_page, _PREFETCH_LIMIT)
 
+    try:
+        understanding = await ai_professor.evaluate_understanding(current_slide.content, request.message, on_token)
+    except Exception:
+        _stash_prefetch(request.object_id, next_page, ai_professor.detach_prefetched_explanation(next_page))
+        raise
+
+    if understanding['recommended_action'] == 'next':
+        ai_professor.current_page += 1
+    else:
+        # Keep it for when the student does move on
+        _stash_prefetch(request.object_id, next_page, ai_professor.detach_prefetched_explanation(next_page))
+
+    if ai_professor.current_page > len(slides):
         file_data[request.object_id]["conversation_history"] = ai_professor.conversation_history
         file_data[request.object_id]["previous_explanations"] = ai_professor.previous_explanations
+        file_data[request.object_id]["conversation_summary"] = ai_professor.conversation_summary
 
         return ChatResponse(
-            message=response['prof_response']['explanation'],
-            current_page=ai_professor.current_page,
+            message="End of conversation.",
+            current_page=request.current_page,
             understanding_assessment=understanding,
-            audio_url=audio_url,
-            verification_question=response['prof_response']['verification_question'],
-            key_points=response['prof_response']['key_points']
+            audio_url="",
+            end_of_conversation=True,
+            verification_question="",
+            key_points=[]
         )
+    
+    current_slide = slides.get(ai_professor.current_page)
+    if not current_slide:
+        raise HTTPException(status_code=400, detail=f"Slide {ai_professor.current_page} not found.")
+    
+    response = await ai_professor.explain_slide(current_slide.content, ai_professor.current_page, on_token)
+    _prefetch_for_next_request(ai_professor, request.object_id, slides, ai_professor.current_page + 1)
+    audio_url = await convert_text_to_speech_and_get_url(response['prof_response']['explanation'])
+
+    file_data[request.object_id]["conversation_history"] = ai_professor.conversation_history
+    file_data[request.object_id]["previous_explanations"] = ai_professor.previous_explanations
+    file_data[request.object_id]["conversation_summary"] = ai_professor.conversation_summary
+
+    return ChatResponse(
+        message=response['prof_response']['explanation'],
+        current_page=ai_professor.current_page,
+        understanding_assessment=understanding,
+        audio_url=audio_url,
+        verification_question=response['prof_response']['verification_question'],
+        key_points=response['prof_response']['key_points']
+    )
+
+@app.post("/chat", response_model=ChatResponse)
+async def continue_chat(request: ChatRequest):
+    """Continues the chat conversation."""
+    if request.object_id not in file_data:
+        raise HTTPException(status_code=404, detail="File not found.")
+
+    try:
+        return await _chat_turn(request)
     except Exception as e:
         print(f"Error during chat interaction: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/chat-stream")
+async def stream_chat(request: ChatRequest):
+    """Continues the chat conversation, streaming NDJSON events while it is generated.
+
+    Each line is {"field": ..., "text": ...} for feedback/greeting/explanation text,
+    followed by a final {"done": true, ...ChatResponse fields} (or {"error": ...}).
+    """
+    if request.object_id not in file_data:
+        raise HTTPException(status_code=404, detail="File not found.")
+
+    async def run(on_token: Callable[[str, str], None]) -> Dict[str, Any]:
+        return (await _chat_turn(request, on_token)).model_dump()
+
+    return _ndjson_response(run, "Error during chat interaction")
+
+@app.get("/explain-stream/{object_id}/{current_page}")
+async def stream_explanation(object_id: str, current_page: int):
+    """Streams the professor's explanation for a page as NDJSON events while it is generated.
+
+    Each line is {"field": ..., "text": ...} for greeting/explanation text, followed by a
+    final {"done": true, "key_points": [...], "verification_question": ...} (or {"error": ...}).
+    """
+    if object_id not in file_data:
+        raise HTTPException(status_code=404, detail="File not found.")
+
+    file_info = file_data[object_id]
+    ai_professor = AIProfessor(file_info["professor_name"])
+    ai_professor.conversation_history = file_info["conversation_history"]
+    ai_professor.previous_explanations = file_info["previous_explanations"]
+    ai_professor.conversation_summary = file_info.get("conversation_summary", {})
+    ai_professor.current_page = current_page
+
+    slides = await asyncio.to_thread(ai_professor.load_slide_index, file_info["processed_content_path"])
+    current_slide = slides.get(current_page)
+    if not current_slide:
+        raise HTTPException(status_code=400, detail=f"Slide {current_page} not found.")
+
+    async def run(on_token: Callable[[str, str], None]) -> Dict[str, Any]:
+        response = await ai_professor.explain_slide(current_slide.content, current_page, on_token)
+        file_data[object_id]["conversation_history"] = ai_professor.conversation_history
+        file_data[object_id]["previous_explanations"] = ai_professor.previous_explanations
+        file_data[object_id]["conversation_summary"] = ai_professor.conversation_summary
+        return {
+            "key_points": response['prof_response']['key_points'],
+            "verification_question": response['prof_response']['verification_question']
+        }
+
+    return _ndjson_response(run, "Error streaming explanation")
+
 @app.get("/check-quiz-readiness/{object_id}/{current_page}", response_model=Dict[str, Any])
 async def check_quiz_readiness(object_id: str, current_page: int):
     """Check if a quiz should be triggered for the current page."""
@@ -262,20 +409,17 @@ async def check_quiz_readiness(object_id: str, current_page: int):
     processed_content_path = file_info["processed_content_path"]
 
     try:
-        with open(processed_content_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-
         ai_professor = AIProfessor(file_info["professor_name"])
         ai_professor.conversation_history = file_info["conversation_history"]
-        slides = ai_professor.parse_slides(content)
-        current_slide = next((slide for slide in slides if slide['page_number'] == current_page), None)
+        slides = await asyncio.to_thread(ai_professor.load_slide_index, processed_content_path)
+        current_slide = slides.get(current_page)
 
         if not current_slide:
             raise HTTPException(status_code=400, detail=f"Slide {current_page} not found.")
 
         understanding_assessment = await ai_professor.teaching_assistant.assess_concept_understanding(
             ai_professor.conversation_history,
-            current_slide['content']
+            current_slide.content
         )
 
         understanding_sufficient = any(
@@ -303,24 +447,27 @@ async def generate_quiz(object_id: str, current_page: int):
     processed_content_path = file_info["processed_content_path"]
 
     try:
-        with open(processed_content_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-
         ai_professor = AIProfessor(file_info["professor_name"])
-        slides = ai_professor.parse_slides(content)
-        current_slide = next((slide for slide in slides if slide['page_number'] == current_page), None)
+        slides = await asyncio.to_thread(ai_professor.load_slide_index, processed_content_path)
+        current_slide = slides.get(current_page)
 
         if not current_slide:
             raise HTTPException(status_code=400, detail=f"Slide {current_page} not found.")
 
         understanding = await ai_professor.teaching_assistant.assess_concept_understanding(
             ai_professor.conversation_history,
-            current_slide['content']
+            current_slide.content
         )
 
+        # The teaching assistant is shared by every session of this professor, so
+        # retakes are tracked per upload; a retake gets a freshly generated quiz
+        quizzed_pages = file_info.setdefault("quizzed_pages", set())
+        retake = current_page in quizzed_pages
+        quizzed_pages.add(current_page)
         quiz = await ai_professor.teaching_assistant.generate_mcq_quiz(
-            current_slide['content'],
-            understanding['key_concepts']
+            current_slide.content,
+            understanding['key_concepts'],
+            retake=retake
         )
 
         file_data[object_id]["current_quiz"] = quiz
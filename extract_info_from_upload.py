@@ -5,13 +5,17 @@ from PIL import Image
 import io
 import base64
 from openai import OpenAI
-import json
 import fitz  # PyMuPDF for PDF processing
 import tempfile
+import functools
+from concurrent.futures import ThreadPoolExecutor
 
 load_dotenv()  # Load environment variables from .env file
 open_api_key = os.getenv("OPENAI_API_KEY")
 
+# Vision requests in flight at once while describing a document's images
+VISION_CONCURRENCY = int(os.getenv("VISION_CONCURRENCY", "8"))
+
 def get_file_type(file_path):
     """
     Determine the file type based on extension
@@ -24,13 +28,78 @@ def get_file_type(file_path):
     else:
         raise ValueError(f"Unsupported file type: {extension}")
 
+def _image_to_base64(image_bytes):
+    """Re-encode an image as base64 PNG for the Vision API"""
+    image = Image.open(io.BytesIO(image_bytes))
+    buffered = io.BytesIO()
+    image.save(buffered, format="PNG")
+    return base64.b64encode(buffered.getvalue()).decode()
+
+def _describe_image(client, img_str):
+    """Analyze one image using OpenAI's Vision model"""
+    response = client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": "Describe this image in detail, extracting the text as well as the images."
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:image/png;base64,{img_str}"
+                        }
+                    }
+                ]
+            }
+        ],
+        max_tokens=300
+    )
+    return response.choices[0].message.content
+
+def _describe_images(client, images):
+    """
+    Describe every (label, base64 PNG) image with a bounded pool of concurrent
+    Vision requests instead of one round trip after another.
+    Returns descriptions in input order, None for images that failed.
+    """
+    def describe(item):
+        label, img_str = item
+        try:
+            return _describe_image(client, img_str)
+        except Exception as e:
+            print(f"Error processing {label}: {str(e)}")
+            return None
+    
+    if not images:
+        return []
+    with ThreadPoolExecutor(max_workers=min(VISION_CONCURRENCY, len(images))) as pool:
+        return list(pool.map(describe, images))
+
+def _assemble_pages(headers, images_per_page, client):
+    """Append each page's image descriptions to its text, describing all images at once"""
+    images = [image for page_images in images_per_page for image in page_images]
+    descriptions = iter(_describe_images(client, images))
+    
+    contents = []
+    for header, page_images in zip(headers, images_per_page):
+        image_descriptions = [d for d in (next(descriptions) for _ in page_images) if d]
+        if image_descriptions:
+            header += "\nImage content:\n" + "\n".join(image_descriptions) + "\n"
+        contents.append(header)
+    return contents
+
 def extract_pdf_content(pdf_path, client):
     """
     Extract content from PDF including text and images.
     Analyzes images using OpenAI's Vision model.
     """
     doc = fitz.open(pdf_path)
-    page_contents = []
+    headers = []
+    images_per_page = []
     
     for page_number, page in enumerate(doc, 1):
         print(f"Processing PDF page {page_number}...")
@@ -40,63 +109,22 @@ def extract_pdf_content(pdf_path, client):
         text = page.get_text()
         if text.strip():
             page_content += "Text content:\n" + text.strip() + "\n"
+        headers.append(page_content)
         
-        # Extract images
-        image_descriptions = []
-        image_list = page.get_images()
-        
-        for img_index, img in enumerate(image_list):
+        # Collect images; they are described together once every page is read
+        page_images = []
+        for img_index, img in enumerate(page.get_images()):
             try:
-                # Get image data
                 xref = img[0]
                 base_image = doc.extract_image(xref)
-                image_bytes = base_image["image"]
-                
-                # Convert to PIL Image
-                image = Image.open(io.BytesIO(image_bytes))
-                
-                # Convert image to base64
-                buffered = io.BytesIO()
-                image.save(buffered, format="PNG")
-                img_str = base64.b64encode(buffered.getvalue()).decode()
-                
-                # Analyze image using OpenAI's Vision model
-                response = client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[
-                        {
-                            "role": "user",
-                            "content": [
-                                {
-                                    "type": "text",
-                                    "text": "Describe this image in detail, extracting the text as well as the images."
-                                },
-                                {
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": f"data:image/png;base64,{img_str}"
-                                    }
-                                }
-                            ]
-                        }
-                    ],
-                    max_tokens=300
-                )
-                
-                image_description = response.choices[0].message.content
-                image_descriptions.append(image_description)
-                
+                page_images.append((f"image {img_index + 1} on page {page_number}",
+                                    _image_to_base64(base_image["image"])))
             except Exception as e:
                 print(f"Error processing image {img_index + 1} on page {page_number}: {str(e)}")
-                continue
-        
-        if image_descriptions:
-            page_content += "\nImage content:\n" + "\n".join(image_descriptions) + "\n"
-        
-        page_contents.append(page_content)
+        images_per_page.append(page_images)
     
     doc.close()
-    return page_contents
+    return _assemble_pages(headers, images_per_page, client)
 
 def extract_ppt_content(ppt_path, client):
     """
@@ -105,7 +133,8 @@ def extract_ppt_content(ppt_path, client):
     """
     # Load presentation
     prs = Presentation(ppt_path)
-    slide_contents = []
+    headers = []
+    images_per_page = []
     
     # Process each slide
     for slide_number, slide in enumerate(prs.slides, 1):
@@ -120,57 +149,20 @@ def extract_ppt_content(ppt_path, client):
         
         if texts:
             slide_content += "Text content:\n" + "\n".join(texts) + "\n"
+        headers.append(slide_content)
         
-        # Extract and analyze images
-        image_descriptions = []
+        # Collect images; they are described together once every slide is read
+        slide_images = []
         for shape in slide.shapes:
             if hasattr(shape, "image"):
                 try:
-                    # Get image data
-                    image_bytes = shape.image.blob
-                    image = Image.open(io.BytesIO(image_bytes))
-                    
-                    # Convert image to base64
-                    buffered = io.BytesIO()
-                    image.save(buffered, format="PNG")
-                    img_str = base64.b64encode(buffered.getvalue()).decode()
-                    
-                    # Analyze image using OpenAI's Vision model
-                    response = client.chat.completions.create(
-                        model="gpt-4o-mini",
-                        messages=[
-                            {
-                                "role": "user",
-                                "content": [
-                                    {
-                                        "type": "text",
-                                        "text": "Describe this image in detail, extracting the text as well as the images."
-                                    },
-                                    {
-                                        "type": "image_url",
-                                        "image_url": {
-                                            "url": f"data:image/png;base64,{img_str}"
-                                        }
-                                    }
-                                ]
-                            }
-                        ],
-                        max_tokens=300
-                    )
-                    
-                    image_description = response.choices[0].message.content
-                    image_descriptions.append(image_description)
-                    
+                    slide_images.append((f"image on slide {slide_number}",
+                                         _image_to_base64(shape.image.blob)))
                 except Exception as e:
                     print(f"Error processing image: {str(e)}")
-                    continue
-        
-        if image_descriptions:
-            slide_content += "\nImage content:\n" + "\n".join(image_descriptions) + "\n"
+        images_per_page.append(slide_images)
         
-        slide_contents.append(slide_content)
-        
-    return slide_contents
+    return _assemble_pages(headers, images_per_page, client)
 
 def save_to_file(contents, output_path):
     """
@@ -182,17 +174,21 @@ def save_to_file(contents, output_path):
     with open(output_path, 'w', encoding='utf-8') as f:
         f.write('\n\n'.join(contents))
 
-def process_document(file_path):
-    """
-    Process either PDF or PowerPoint document and extract content
-    """
+@functools.cache
+def _openai_client():
+    """One OpenAI client per process, so uploads reuse its keep-alive connection pool"""
     # Get API key from environment variable
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         raise ValueError("OpenAI API key not found in environment variables")
     
-    # Initialize OpenAI client
-    client = OpenAI(api_key=api_key)
+    return OpenAI(api_key=api_key)
+
+def process_document(file_path):
+    """
+    Process either PDF or PowerPoint document and extract content
+    """
+    client = _openai_client()
     
     # Determine file type
     file_type = get_file_type(file_path)
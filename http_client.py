@@ -0,0 +1,46 @@
+import os
+import asyncio
+import functools
+import httpx
+
+try:
+    import h2  # noqa: F401  optional: enables HTTP/2 (pip install httpx[http2])
+    _HTTP2 = True
+except ImportError:
+    _HTTP2 = False
+
+@functools.cache
+def shared_async_http_client() -> httpx.AsyncClient:
+    """One keep-alive connection pool for every OpenAI client in the process
+    
+    With h2 installed, concurrent requests are multiplexed over HTTP/2 streams
+    instead of each holding its own connection.
+    """
+    return httpx.AsyncClient(
+        http2=_HTTP2,
+        limits=httpx.Limits(max_connections=512, max_keepalive_connections=256),
+        timeout=httpx.Timeout(120.0)
+    )
+
+@functools.cache
+def llm_semaphore() -> asyncio.Semaphore:
+    """Process-wide cap on in-flight LLM requests (LLM_CONCURRENCY, default 16)
+    
+    Keeps bursts of concurrent explain/evaluate/prefetch/TA calls under the OpenAI
+    rate limits instead of paying 429 retry backoff.
+    """
+    return asyncio.Semaphore(int(os.getenv("LLM_CONCURRENCY", "16")))
+
+def llm_max_retries() -> int:
+    """Retries for 429s, connection errors and 5xx (LLM_MAX_RETRIES, default 6)
+    
+    The OpenAI SDK already retries these with jittered exponential backoff and
+    honours Retry-After; its default of 2 is too few once requests are fanned out.
+    """
+    return int(os.getenv("LLM_MAX_RETRIES", "6"))
+
+async def close_shared_async_http_client():
+    """Close the shared pool (call once on shutdown)"""
+    if shared_async_http_client.cache_info().currsize:
+        await shared_async_http_client().aclose()
+        shared_async_http_client.cache_clear()
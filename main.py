@@ -1,21 +1,94 @@
 import os
 from dotenv import load_dotenv
-from typing import Dict, List, TypedDict, Optional, Any
-from langchain_openai import ChatOpenAI
+from typing import Deque, Dict, Iterable, Iterator, Mapping, Union, FrozenSet, List, Literal, Tuple, Optional, Any, Callable, Sequence
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain.schema import HumanMessage, SystemMessage
+from pydantic import BaseModel, Field
+import copy
 import json
+import orjson
+import re
+import string
+import time
+import mmap
+import hashlib
+import threading
+import weakref
+import sys
 import asyncio
-import difflib
+import functools
+from collections import OrderedDict, deque
+from itertools import islice
+from dataclasses import dataclass
+from types import MappingProxyType
+import numpy as np
 
 # Import the Teaching Assistant
 from ai_teaching_assistant import AITeachingAssistant, run_quiz_interaction
+from http_client import shared_async_http_client, close_shared_async_http_client, llm_semaphore, llm_max_retries
+
+load_dotenv()  # Load environment variables once at import, not per AIProfessor
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # optional: similarity checks then use the OpenAI embeddings API
+    SentenceTransformer = None
+
+try:
+    import tiktoken
+except ImportError:  # optional: token budgets are then estimated at ~4 characters per token
+    tiktoken = None
+
+_LOCAL_ENCODER_MODEL = "all-MiniLM-L6-v2"
+# text-embedding-3 vectors truncate cleanly (Matryoshka training); 256 of 1536 dimensions keep
+# near-duplicate detection intact while shrinking responses, stored vectors and every matmul 6x
+_EMBEDDING_DIMENSIONS = 256
+
+# Input token budgets per prompt section, so a pathological slide or a run of long
+# student messages cannot blow up prefill cost and latency
+SLIDE_TOKEN_BUDGET = int(os.getenv("SLIDE_TOKEN_BUDGET", "1200"))
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))
+
+@functools.cache
+def _local_encoder():
+    """Local sentence embedding model (~10 ms per text on CPU, no network round trip)"""
+    return SentenceTransformer(_LOCAL_ENCODER_MODEL)
+
+# Models per call site: explanations are the student-facing prose, while the understanding
+# assessment is a small classification-plus-feedback task that a smaller, faster model handles
+EXPLANATION_MODEL = os.getenv("EXPLANATION_MODEL", "gpt-4o-mini")
+ASSESSMENT_MODEL = os.getenv("ASSESSMENT_MODEL", "gpt-4.1-nano")
+
+@functools.cache
+def _token_encoding():
+    return tiktoken.get_encoding("o200k_base")  # gpt-4o / gpt-4.1 family
+
+def _fit_tokens(text: str, budget: int, keep_head: bool = False) -> str:
+    """Trim text to about budget tokens, dropping the start (or the middle, with keep_head)"""
+    if len(text) <= budget:  # every token is at least one character
+        return text
+    if tiktoken is None:
+        limit = budget * 4
+        if len(text) <= limit:
+            return text
+        if keep_head:
+            return text[:limit // 2] + "\n...\n" + text[-(limit // 2):]
+        return "..." + text[-limit:]
+    encoding = _token_encoding()
+    tokens = encoding.encode(text)
+    if len(tokens) <= budget:
+        return text
+    if keep_head:
+        half = budget // 2
+        return encoding.decode(tokens[:half]) + "\n...\n" + encoding.decode(tokens[-half:])
+    return "..." + encoding.decode(tokens[-budget:])
 
 def setup_environment():
     """Setup and validate environment variables"""
     load_dotenv()
     os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
 
-PROFESSOR_PROFILES = {
+_PROFILES = {
     "Andrew NG": """You are an AI assistant emulating the teaching style of Andrew Ng, a machine learning expert, teaching a student one-on-one. Your primary goal is to help students understand complex machine learning concepts intuitively and practically, equipping them to build and debug their own applications.
 Begin by framing the learning problem clearly, often using real-world examples (e.g., house price prediction, spam filtering, autonomous helicopters) to motivate the topic. Break down complex ideas into smaller, manageable steps, starting with simpler models like linear regression and gradually progressing to more advanced techniques. Always emphasize the practical application of these concepts.
 When explaining algorithms, prioritize clarity and intuitive understanding. Use analogies and diagrams to illustrate abstract mathematical concepts, and carefully explain the purpose of each step. Don't shy away from the underlying math when needed. Work through equations step-by-step, and provide clear explanations for each variable and operation, but remind the user of where they saw the math before, or why it is needed.
@@ -32,39 +105,519 @@ Use plain language and avoid unnecessary jargon, but clearly define and consiste
 Engage the user by asking questions that encourage active thinking and problem-solving. Use a measured pace and a serious, respectful tone, clearly signaling each step towards deeper understanding. Focus on building a robust foundation for future learning, rather than showcasing the fanciest or most cutting-edge techniques."""
 }
 
-class SlideContent(TypedDict):
-    """Structure for slide content"""
+# Read-only view: profiles are shared process-wide and must not be mutated
+PROFESSOR_PROFILES = MappingProxyType(_PROFILES)
+
+# Profile system messages are built once so every prompt starts with the same object
+PROFESSOR_SYSTEM_MSGS = MappingProxyType(
+    {name: SystemMessage(content=profile) for name, profile in PROFESSOR_PROFILES.items()}
+)
+
+# Per-turn prompt templates, built once instead of as f-strings on every call
+_EXPLAIN_CONTEXT_TEMPLATE = string.Template("""IMPORTANT: Avoid repeating previous explanations. 
+        If your explanation is too similar to past explanations, provide a 
+        substantially different approach, such as:
+        - Using a completely different analogy
+        - Focusing on different aspects of the topic
+        - Changing the level of detail
+        - Providing a contrasting perspective
+        
+        Previous Conversation Context:
+        $context
+        """)
+
+_EXPLAIN_HUMAN_TEMPLATE = string.Template("""Current slide (Page $page):
+            $slide""")
+
+_EVAL_CONTEXT_TEMPLATE = string.Template("""Evaluate the student's response to the slide content and provide:
+                1. Feedback on their understanding
+                2. Recommendation to stay or move to next slide
+                3. Reasoning for your decision
+                
+                Previous Conversation Context:
+                $context""")
+
+_EVAL_HUMAN_TEMPLATE = string.Template("""Slide Content:
+                $slide
+                
+                Student Response:
+                $response""")
+
+# Human-facing CLI output is queued and written off the event-loop thread
+_LOG_Q: asyncio.Queue = asyncio.Queue()
+_log_writer: Optional[asyncio.Task] = None
+
+def _log(text: str = "", end: str = "\n") -> None:
+    """Queue CLI output without blocking the event loop"""
+    _LOG_Q.put_nowait(text + end)
+
+def _write_out(text: str, flush: bool):
+    sys.stdout.write(text)
+    if flush:
+        sys.stdout.flush()
+
+async def _drain_logs():
+    """Write queued output to stdout from a worker thread"""
+    while True:
+        # Coalesce everything queued meanwhile (e.g. a burst of streamed tokens)
+        # into one write, so each thread hop and flush covers many tokens
+        parts = [await _LOG_Q.get()]
+        while not _LOG_Q.empty():
+            parts.append(_LOG_Q.get_nowait())
+        try:
+            await asyncio.to_thread(_write_out, "".join(parts), True)
+        finally:
+            for _ in parts:
+                _LOG_Q.task_done()
+
+def _start_log_writer():
+    """Start the background log writer once per event loop"""
+    global _log_writer
+    if (_log_writer is None or _log_writer.done()
+            or _log_writer.get_loop() is not asyncio.get_running_loop()):
+        _log_writer = asyncio.create_task(_drain_logs())
+
+async def _ainput(prompt: str) -> str:
+    """input() on a worker thread so background tasks keep running while the user types"""
+    return (await asyncio.to_thread(input, prompt)).strip()
+
+async def _flush_logs():
+    """Wait until every queued line has been written (e.g. before prompting)"""
+    _start_log_writer()
+    await _LOG_Q.join()
+    await asyncio.to_thread(sys.stdout.flush)
+
+_JSON_VALUE_START = re.compile(r'\s*:\s*"')
+
+class _JsonFieldStreamer:
+    """Incrementally extract string fields from a JSON object as it is streamed.
+
+    Fields are expected in the order given (the order the model writes them);
+    fields the model omits are skipped. Decoded text is passed to
+    ``on_text(field, text)``, and each field's full text to ``on_close(field, text)``
+    as soon as its string closes.
+    """
+    def __init__(self, fields: Sequence[str], on_text: Optional[Callable[[str, str], None]] = None,
+                 on_close: Optional[Callable[[str, str], None]] = None):
+        self._fields = list(fields)
+        self._on_text = on_text
+        self._on_close = on_close
+        self._parts: List[str] = []
+        self._buffer = ""
+        self._search_from = 0
+        self._cursor: Optional[int] = None
+
+    def feed(self, chunk: str):
+        self._buffer += chunk
+        while self._fields:
+            if self._cursor is None:
+                # Take the earliest remaining field so an omitted one doesn't stall the stream
+                found = [(self._buffer.find(f'"{f}"', self._search_from), n) for n, f in enumerate(self._fields)]
+                found = [(pos, n) for pos, n in found if pos != -1]
+                if not found:
+                    return
+                key, n = min(found)
+                del self._fields[:n]
+                match = _JSON_VALUE_START.match(self._buffer, key + len(self._fields[0]) + 2)
+                if not match:
+                    return
+                self._cursor = match.end()
+            if not self._emit_available():
+                return
+            # Field finished; look for the next one after it
+            if self._on_close:
+                self._on_close(self._fields[0], "".join(self._parts))
+                self._parts.clear()
+            self._search_from = self._cursor
+            self._cursor = None
+            self._fields.pop(0)
+
+    def _emit_available(self) -> bool:
+        """Emit decoded text up to a safe boundary; return True once the string closes"""
+        buf, start = self._buffer, self._cursor
+        i, end, closed = start, len(buf), False
+        while i < end:
+            c = buf[i]
+            if c == '\\':
+                width = 2
+                if buf[i + 1:i + 2] == 'u':
+                    # Keep surrogate pairs together so they decode as one character
+                    width = 12 if buf[i + 2:i + 4].lower() in ('d8', 'd9', 'da', 'db') else 6
+                if i + width > end:
+                    break
+                i += width
+            elif c == '"':
+                closed = True
+                break
+            else:
+                i += 1
+        if i > start:
+            fragment = '"' + buf[start:i] + '"'
+            try:
+                text = orjson.loads(fragment)
+            except orjson.JSONDecodeError:
+                text = json.loads(fragment)  # tolerates lone surrogate escapes, orjson does not
+            if self._on_text:
+                self._on_text(self._fields[0], text)
+            if self._on_close:
+                self._parts.append(text)
+        self._cursor = i + 1 if closed else i
+        return closed
+
+# Caps concurrent speculative explanation requests to stay clear of rate limits
+_PREFETCH_SEMAPHORE = asyncio.Semaphore(4)
+# Prefetch tasks still waiting for their semaphore; a student who arrives first
+# cancels these and generates inline rather than queueing behind other prefetches
+_QUEUED_PREFETCHES: "weakref.WeakSet[asyncio.Future]" = weakref.WeakSet()
+
+class _ExplanationCache:
+    """On-disk LRU of parsed slide explanations, one JSON file per prompt hash.
+
+    Entries expire after `ttl` seconds without use; once there are more than
+    `max_entries`, the least recently used tenth is removed. The most recently
+    used `memory_entries` are also kept in memory, so repeat hits skip the disk.
+    """
+    def __init__(self, directory: str = "./.slide_cache", ttl: float = 30 * 24 * 3600,
+                 max_entries: int = 2048, memory_entries: int = 256):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self._memory: OrderedDict[str, Dict[str, Any]] = OrderedDict()
+        self._memory_lock = threading.Lock()
+        # Files on disk, counted once per process and then tracked, so writes only
+        # scan the directory when an eviction is actually due
+        self._entries: Optional[int] = None
+        self._entries_lock = threading.Lock()
+
+    @staticmethod
+    def key(model: str, messages: Sequence[Any]) -> str:
+        """Hash the exact prompt, so any change in profile, context or slide is a miss"""
+        digest = hashlib.sha256(model.encode())
+        for message in messages:
+            digest.update(b"\0" + message.content.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def peek(self, key: str) -> Optional[Dict[str, Any]]:
+        """In-memory lookup only: a dict access, safe to call on the event loop"""
+        with self._memory_lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+            return value
+
+    def _remember(self, key: str, value: Dict[str, Any]):
+        with self._memory_lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            if len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self.peek(key)
+        if value is not None:
+            return value
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                self._track(-1)
+                return None
+            with open(path, 'rb') as file:
+                value = orjson.loads(file.read())
+            os.utime(path)  # mark as recently used
+        except (OSError, ValueError):
+            return None
+        self._remember(key, value)
+        return value
+
+    def set(self, key: str, value: Dict[str, Any]):
+        self._remember(key, value)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path(key)
+            added = not os.path.exists(path)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, 'wb') as file:
+                file.write(orjson.dumps(value))
+            os.replace(tmp_path, path)
+            if added and self._track(1) > self.max_entries:
+                self._evict()
+        except OSError as e:
+            print(f"Error writing explanation cache: {e}")
+
+    def _scan(self) -> List[os.DirEntry]:
+        return [entry for entry in os.scandir(self.directory) if entry.name.endswith(".json")]
+
+    def _track(self, delta: int) -> int:
+        """Apply a change to the entry count and return it, counting the directory on first use"""
+        with self._entries_lock:
+            if self._entries is None:
+                self._entries = len(self._scan())  # already includes the file just written
+            else:
+                self._entries = max(self._entries + delta, 0)
+            return self._entries
+
+    def _evict(self):
+        # Rescan rather than trust the count: other processes (e.g. warm_cache.py) share the directory.
+        # Trim a tenth below the cap so the next scan is that many new entries away.
+        entries = self._scan()
+        if len(entries) > self.max_entries:
+            keep = self.max_entries - self.max_entries // 10
+            entries.sort(key=lambda entry: entry.stat().st_mtime)
+            for entry in entries[:len(entries) - keep]:
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+            entries = entries[len(entries) - keep:]
+        with self._entries_lock:
+            self._entries = len(entries)
+
+_EXPLANATION_CACHE = _ExplanationCache()
+
+# Evaluations per (professor, slide): normalized student-response vectors with their results (LRU)
+_EVALUATION_INDEX: OrderedDict[Tuple[str, str], Deque[Tuple[np.ndarray, Dict[str, Any]]]] = OrderedDict()
+_EVALUATION_INDEX_SIZE = 1024
+_EVALUATIONS_PER_SLIDE = 32
+
+# MinHash permutations (a*x + b) mod p over 32-bit shingle hashes; p > 2**32 and a, b < 2**31
+# keep every product inside uint64. 128 permutations estimate Jaccard to about +/-0.04.
+_MINHASH_PRIME = np.uint64(4294967311)
+_MINHASH_A, _MINHASH_B = np.random.default_rng(0x5EED).integers(1, 2**31 - 1, size=(2, 128), dtype=np.uint64)
+# Candidates whose estimate is within this of the threshold are checked exactly
+_MINHASH_MARGIN = 0.1
+
+# Strong references to fire-and-forget tasks so they are not garbage collected mid-run
+_BACKGROUND_TASKS: set = set()
+
+# --- Structured Output Schemas ---
+class ProfResponse(BaseModel):
+    greeting: str = Field(description="Short greeting, may be empty")
+    explanation: str = Field(description="Detailed explanation in your teaching style")
+    key_points: List[str]
+    verification_question: str = Field(description="Question to check understanding")
+
+class TeachingNotes(BaseModel):
+    difficulty_level: Literal["basic", "intermediate", "advanced"]
+    prerequisites: List[str]
+    suggested_exercises: List[str]
+
+class ExplanationSchema(BaseModel):
+    prof_response: ProfResponse
+    teaching_notes: TeachingNotes
+
+class UnderstandingAssessment(BaseModel):
+    level: Literal["low", "medium", "high"]
+    feedback: str = Field(description="Detailed explanation of the student's understanding")
+    areas_to_improve: List[str]
+
+class UnderstandingSchema(BaseModel):
+    understanding_assessment: UnderstandingAssessment
+    recommended_action: Literal["stay", "next"]
+    reasoning: str = Field(description="Why the student should stay or move on")
+
+@functools.cache
+def _json_schema_format(model: type) -> Dict[str, Any]:
+    """OpenAI strict json_schema response_format for a Pydantic model.
+
+    Strict mode needs every property required and no additional properties.
+    """
+    schema = model.model_json_schema()
+    def tighten(node):
+        if isinstance(node, dict):
+            if "properties" in node:
+                node["additionalProperties"] = False
+                node["required"] = list(node["properties"])
+            for value in node.values():
+                tighten(value)
+        elif isinstance(node, list):
+            for value in node:
+                tighten(value)
+    tighten(schema)
+    return {"type": "json_schema", "json_schema": {"name": model.__name__, "strict": True, "schema": schema}}
+
+def _to_openai_messages(messages: Sequence[Any]) -> List[Dict[str, str]]:
+    """LangChain system/human messages as raw chat-completions message dicts"""
+    return [{"role": "system" if isinstance(m, SystemMessage) else "user", "content": m.content}
+            for m in messages]
+
+@dataclass(frozen=True, slots=True)
+class SlideContent:
+    """Structure for slide content
+    
+    Frozen because parsed decks are cached and shared between callers; slotted
+    so a large deck costs two references per slide instead of a dict each.
+    """
     page_number: int
     content: str
 
+# A page header line plus the "Text content:" line that usually follows it, so most
+# bodies need no further scan for that marker
+_PAGE_HEADER = re.compile(r'^Page (\d+).*\n?(?:[^\S\n]*Text content:[^\S\n]*(?:\n|\Z))?', re.M)
+_PAGE_HEADER_BYTES = re.compile(rb'^Page (\d+).*\n?(?:[^\S\n]*Text content:[^\S\n]*(?:\n|\Z))?', re.M)
+_TEXT_CONTENT_LINE = re.compile(r'^[^\S\n]*Text content:[^\S\n]*(?:\n|\Z)', re.M)
+_TEXT_CONTENT_LINE_BYTES = re.compile(rb'^[^\S\n]*Text content:[^\S\n]*(?:\n|\Z)', re.M)
+
+def _page_spans(headers: List[re.Match], size: int) -> Iterator[Tuple[int, int, int]]:
+    """(page_number, body start, body end) for each header match, bodies running to the next header"""
+    ends = [header.start() for header in headers[1:]] + [size]
+    for header, end in zip(headers, ends):
+        yield int(header.group(1)), header.end(), end
+
+# Parsed slide files keyed by path: ((mtime_ns, size) of the parsed version, slides, page index).
+# Entries are read-only (tuple / mappingproxy) since they are shared between callers.
+_slide_cache: "OrderedDict[str, Tuple[Tuple[int, int], Tuple[SlideContent, ...], Mapping[int, SlideContent]]]" = OrderedDict()
+_SLIDE_CACHE_SIZE = 32
+# Loads run in to_thread workers; guards the lookup, reorder and eviction steps
+_slide_cache_lock = threading.Lock()
+
 class AIProfessor:
+    # Prompt context keeps this many recent turns verbatim and summarizes the rest
+    KEEP_RECENT = 6
+    # Summary lines that trigger a background LLM condensation into summary_text
+    SUMMARY_LINES = 12
+    # Only this many recent explanations are kept for the anti-repetition check
+    MAX_PREVIOUS_EXPLANATIONS = 32
+    # Conversation entries kept in memory; older ones survive only in the summary
+    MAX_HISTORY = 64
+    
     def __init__(self, name: str):
-        # Load environment variables
-        load_dotenv()
+        # Shared OpenAI clients + schema-bound runnables (built once per process)
+        self.llm, self.explanation_llm, self.embeddings = self._shared_llms()
         
-        # Initialize OpenAI API
-        self.llm = ChatOpenAI(
-            temperature=0.7,
-            model="gpt-4o-mini",
-            streaming=False
-        )
+        # Semantic anti-repetition check
+        # (MiniLM cosine runs lower than OpenAI's for the same paraphrase)
+        self.semantic_similarity_threshold = 0.85 if SentenceTransformer is not None else 0.9
+        # Seconds of regeneration allowed per explanation before accepting the latest one
+        self.regeneration_budget = 20.0
+        # Candidate explanations requested per regeneration call (OpenAI n=)
+        self.retry_candidates = 3
+        # Answers are short, so only near-paraphrases of an earlier answer may reuse its evaluation
+        self.evaluation_match_threshold = 0.95
+        self._explanation_vectors: Dict[str, np.ndarray] = {}
+        self._previous_rows: Tuple[str, ...] = ()
+        self._previous_vectors: Optional[np.ndarray] = None
+        self._explanation_shingles: Dict[str, FrozenSet[int]] = {}
+        self._explanation_minhashes: Dict[str, np.ndarray] = {}
+        self._minhash_rows: Tuple[str, ...] = ()
+        self._minhash_matrix: Optional[np.ndarray] = None
         
-        # Basic attributes
+        # Basic attributes; unknown professors still fail at construction
+        if name not in PROFESSOR_PROFILES:
+            raise KeyError(name)
         self.name = name
-        self.profile = PROFESSOR_PROFILES[name]
+        # Requests sharing a prompt_cache_key are routed to the same OpenAI prompt-cache
+        # shard; every prompt for a professor starts with that professor's static profile
+        self._cache_routing = {"prompt_cache_key": f"professor-{name}"}
+        self.explanation_llm = self.explanation_llm.bind(extra_body=self._cache_routing)
         self.current_page = 1
         self.max_pages = 1
         
         # Initialize conversation history and explanations
-        self.conversation_history: List[Dict[str, Any]] = []
-        self.previous_explanations: List[str] = []
+        self.conversation_history = []
+        self.previous_explanations = []
         
-        # Initialize teaching assistant
-        try:
-            self.teaching_assistant = AITeachingAssistant(name)
-        except Exception as e:
-            print(f"Error initializing teaching assistant: {e}")
-            self.teaching_assistant = None
+        # Rolling summary of history older than KEEP_RECENT: an LLM-condensed paragraph
+        # plus one line per turn not yet condensed
+        self.summary_text = ""
+        self._summary: deque = deque(maxlen=2 * self.SUMMARY_LINES)
+        self._summary_source: Optional[List[Dict[str, Any]]] = None
+        self._summarized_upto = 0
+        self._summary_task: Optional[asyncio.Task] = None
+        # (history, length, last entry, summary_text, rendered context) of the last render
+        self._context_memo: Optional[Tuple[Any, int, Any, str, str]] = None
+        
+        # Speculatively generated explanations (tasks or batch futures), keyed by page number
+        self._prefetched_explanations: Dict[int, asyncio.Future] = {}
+        self._prefetch_batch: Optional[asyncio.Task] = None
+        
+        # Slides of the current session keyed by page number
+        self._page_index: Mapping[int, SlideContent] = {}
+        
+        # Teaching assistant is created on first use; it holds this session's quiz state,
+        # while its LLM clients and quiz cache are shared process-wide
+        self._teaching_assistant: Optional[AITeachingAssistant] = None
+    
+    @property
+    def profile(self) -> str:
+        """Looked up by name rather than stored, so instances only carry the name"""
+        return PROFESSOR_PROFILES[self.name]
+    
+    @property
+    def teaching_assistant(self) -> Optional[AITeachingAssistant]:
+        """This session's teaching assistant, or None if it cannot be created"""
+        if self._teaching_assistant is None:
+            try:
+                self._teaching_assistant = AITeachingAssistant(self.name)
+            except Exception as e:
+                print(f"Error initializing teaching assistant: {e}")
+        return self._teaching_assistant
+    
+    @teaching_assistant.setter
+    def teaching_assistant(self, assistant: Optional[AITeachingAssistant]):
+        self._teaching_assistant = assistant
+    
+    @property
+    def conversation_history(self) -> Deque[Dict[str, Any]]:
+        """Recent conversation entries, bounded so memory and per-turn work stay O(1)"""
+        return self._conversation_history
+    
+    @conversation_history.setter
+    def conversation_history(self, history):
+        # Accept plain lists (e.g. a session restored by the API) and keep the bound
+        if not (isinstance(history, deque) and history.maxlen == self.MAX_HISTORY):
+            history = deque(history, maxlen=self.MAX_HISTORY)
+        self._conversation_history = history
+    
+    @property
+    def conversation_summary(self) -> Dict[str, Any]:
+        """Rolling summary state, so a restored session (e.g. per API request) keeps its digest"""
+        return {"text": self.summary_text, "lines": list(self._summary), "upto": self._summarized_upto}
+    
+    @conversation_summary.setter
+    def conversation_summary(self, state: Dict[str, Any]):
+        # Assign after conversation_history: the cursor indexes into that history
+        self.summary_text = state.get("text", "")
+        self._summary.clear()
+        self._summary.extend(state.get("lines", ()))
+        self._summary_source = self.conversation_history
+        self._summarized_upto = min(state.get("upto", 0), len(self.conversation_history))
+    
+    @property
+    def previous_explanations(self) -> Deque[str]:
+        """Most recent explanations given, bounded so similarity checks stay O(1) per turn"""
+        return self._previous_explanations
+    
+    @previous_explanations.setter
+    def previous_explanations(self, explanations):
+        # Accept plain lists (e.g. a session restored by the API) and keep the bound
+        if not (isinstance(explanations, deque) and explanations.maxlen == self.MAX_PREVIOUS_EXPLANATIONS):
+            explanations = deque(explanations, maxlen=self.MAX_PREVIOUS_EXPLANATIONS)
+        self._previous_explanations = explanations
+    
+    @classmethod
+    @functools.cache
+    def _shared_llms(cls):
+        """Build the LLM clients once per class so every instance shares one connection pool"""
+        # Initialize OpenAI API (streamed JSON so text can be shown as it arrives)
+        llm = ChatOpenAI(
+            temperature=0.7,
+            model=EXPLANATION_MODEL,
+            streaming=True,
+            http_async_client=shared_async_http_client(),
+            max_retries=llm_max_retries()
+        )
+        # Schema-constrained runnables: output always parses and matches the expected shape
+        return (
+            llm,
+            llm.bind(response_format=_json_schema_format(ExplanationSchema)),
+            OpenAIEmbeddings(model="text-embedding-3-small", dimensions=_EMBEDDING_DIMENSIONS,
+                             http_async_client=shared_async_http_client(), max_retries=llm_max_retries()),
+        )
     
     def add_to_conversation_history(self, role: str, content: str, metadata: Optional[Dict[str, Any]] = None):
         """Add a message to the conversation history"""
@@ -75,63 +628,335 @@ class AIProfessor:
         }
         if metadata:
             entry.update(metadata)
-        self.conversation_history.append(entry)
+        history = self.conversation_history
+        if len(history) == history.maxlen and self._summary_source is history:
+            # The oldest entry is about to drop off; keep the summary cursor aligned
+            self._summarized_upto = max(self._summarized_upto - 1, 0)
+        history.append(entry)
     
     def get_conversation_context(self) -> str:
-        """Retrieve the conversation context as a formatted string"""
-        context = "Conversation History:\n"
-        for message in self.conversation_history:
-            context += f"Page {message.get('page', 'N/A')} - {message['role']}: {message['content']}\n"
-        return context.strip()
+        """Retrieve the conversation context as a formatted string
+        
+        Every prompt built in a turn (explanation, prefetches, evaluation) asks for
+        this, so the rendered text is reused until the history or summary changes.
+        """
+        history = self.conversation_history
+        last = history[-1] if history else None
+        memo = self._context_memo
+        if (memo is not None and memo[0] is history and memo[1] == len(history)
+                and memo[2] is last and memo[3] is self.summary_text):
+            return memo[4]
+        
+        recent = self._summarize_older_turns()
+        parts = ["Conversation History:"]
+        if self.summary_text or self._summary:
+            parts.append("Summary of earlier turns:")
+            if self.summary_text:
+                parts.append(self.summary_text)
+            parts.extend(self._summary)
+        parts.extend(f"Page {message.get('page', 'N/A')} - {message['role']}: {message['content']}"
+                     for message in recent)
+        # Over budget, the oldest lines go first
+        context = _fit_tokens("\n".join(parts).strip(), CONTEXT_TOKEN_BUDGET)
+        self._context_memo = (history, len(history), last, self.summary_text, context)
+        return context
     
-    def check_explanation_similarity(self, new_explanation: str, threshold: float = 0.8) -> bool:
+    def _summarize_older_turns(self) -> List[Dict[str, Any]]:
+        """Fold turns that fell out of the recent window into the summary; return the window"""
+        history = self.conversation_history
+        # The history list may be replaced wholesale (new session, restored from storage)
+        if self._summary_source is not history or self._summarized_upto > len(history):
+            self.summary_text = ""
+            self._summary.clear()
+            self._summary_source = history
+            self._summarized_upto = 0
+            if self._summary_task is not None:
+                self._summary_task.cancel()
+                self._summary_task = None
+        
+        cutoff = max(len(history) - self.KEEP_RECENT, 0)
+        for message in islice(history, self._summarized_upto, cutoff):
+            first_line = message['content'].strip().split("\n", 1)[0]
+            if len(first_line) > 80:
+                first_line = first_line[:77] + "..."
+            self._summary.append(f"Page {message.get('page', 'N/A')} - {message['role']}: {first_line}")
+        self._summarized_upto = max(self._summarized_upto, cutoff)
+        
+        if len(self._summary) >= self.SUMMARY_LINES and (self._summary_task is None or self._summary_task.done()):
+            try:
+                self._summary_task = asyncio.get_running_loop().create_task(
+                    self._condense_summary(list(self._summary), history)
+                )
+            except RuntimeError:
+                pass  # no event loop: keep the line summary
+        
+        return list(islice(history, cutoff, None))
+    
+    async def _condense_summary(self, lines: List[str], history: List[Dict[str, Any]]):
+        """Fold the per-turn summary lines into summary_text with one LLM call"""
+        try:
+            async with llm_semaphore():
+                response = await self.llm.ainvoke([
+                    SystemMessage(content="Condense this tutoring session log into a summary of at most "
+                                          "150 words. Keep the topics covered, what the student "
+                                          "understood or struggled with, and the current page."),
+                    HumanMessage(content=f"Existing summary:\n{self.summary_text or '(none)'}\n\n"
+                                         f"New turns:\n" + "\n".join(lines))
+                ])
+        except Exception as e:
+            print(f"Error condensing conversation summary: {e}")
+            return
+        # Ignore the result if the session was reset meanwhile
+        if self._summary_source is not history:
+            return
+        self.summary_text = response.content.strip()
+        for _ in range(min(len(lines), len(self._summary))):
+            self._summary.popleft()
+    
+    async def check_explanation_similarity(self, new_explanation: str, threshold: float = 0.8) -> bool:
         """
         Check if the new explanation is too similar to previous explanations
         Returns True if the explanation is too similar, False otherwise
+        
+        Near-verbatim repeats are caught locally by shingle Jaccard above `threshold`;
+        otherwise embedding cosine similarity (semantic_similarity_threshold) decides.
         """
-        for prev_explanation in self.previous_explanations:
-            # Use difflib to calculate similarity ratio
-            similarity = difflib.SequenceMatcher(None, prev_explanation, new_explanation).ratio()
-            if similarity > threshold:
-                return True
-        return False
+        similarity, limit = await self._max_similarity(new_explanation, threshold)
+        return similarity > limit
+    
+    async def _max_similarity(self, new_explanation: str, threshold: float = 0.8) -> Tuple[float, float]:
+        """Return (highest similarity to a previous explanation, threshold that applies to it)"""
+        if not self.previous_explanations:
+            return 0.0, self.semantic_similarity_threshold
+        
+        # Cheap local check first: a near-verbatim repeat needs no embedding request.
+        # MinHash estimates Jaccard against every previous explanation in one numpy pass;
+        # only plausible candidates get the exact set comparison.
+        signatures = self._previous_minhashes()
+        previous = self._minhash_rows
+        estimates = (signatures == self._minhash(new_explanation)).mean(axis=1)
+        new_shingles = self._shingles(new_explanation)
+        jaccard = max((self._jaccard(new_shingles, self._shingles(previous[i]))
+                       for i in np.flatnonzero(estimates > threshold - _MINHASH_MARGIN)),
+                      default=float(estimates.max()))
+        if jaccard > threshold:
+            return jaccard, threshold
+        
+        try:
+            await self._embed_explanations([*self.previous_explanations, new_explanation])
+            similarities = self._previous_matrix() @ self._explanation_vectors[new_explanation]
+            return float(similarities.max()), self.semantic_similarity_threshold
+        except Exception as e:
+            print(f"Embedding similarity check failed, using shingle similarity: {e}")
+            return jaccard, threshold
+    
+    def _shingles(self, text: str, k: int = 5) -> FrozenSet[int]:
+        """Hashed k-character shingles of the normalized text, cached per explanation"""
+        shingles = self._explanation_shingles.get(text)
+        if shingles is None:
+            normalized = " ".join(text.lower().split())
+            shingles = frozenset(hash(normalized[i:i + k]) & 0xFFFFFFFF
+                                 for i in range(max(len(normalized) - k + 1, 1)))
+            if len(self._explanation_shingles) > 2 * self.MAX_PREVIOUS_EXPLANATIONS:
+                # Drop entries for explanations that are no longer tracked
+                keep = set(self.previous_explanations)
+                self._explanation_shingles = {t: v for t, v in self._explanation_shingles.items() if t in keep}
+            self._explanation_shingles[text] = shingles
+        return shingles
+    
+    def _minhash(self, text: str) -> np.ndarray:
+        """MinHash signature of the text's shingles, cached per explanation"""
+        signature = self._explanation_minhashes.get(text)
+        if signature is None:
+            shingles = np.fromiter(self._shingles(text), dtype=np.uint64)
+            signature = ((_MINHASH_A[:, None] * shingles + _MINHASH_B[:, None]) % _MINHASH_PRIME).min(axis=1)
+            if len(self._explanation_minhashes) > 2 * self.MAX_PREVIOUS_EXPLANATIONS:
+                keep = set(self.previous_explanations)
+                self._explanation_minhashes = {t: v for t, v in self._explanation_minhashes.items() if t in keep}
+            self._explanation_minhashes[text] = signature
+        return signature
+    
+    def _previous_minhashes(self) -> np.ndarray:
+        """(N, 128) MinHash signatures of the previous explanations, restacked only when they change"""
+        previous = tuple(self.previous_explanations)
+        if previous != self._minhash_rows:
+            self._minhash_matrix = np.stack([self._minhash(text) for text in previous])
+            self._minhash_rows = previous
+        return self._minhash_matrix
+    
+    @staticmethod
+    def _jaccard(a: FrozenSet[int], b: FrozenSet[int]) -> float:
+        union = len(a | b)
+        return len(a & b) / union if union else 0.0
+    
+    async def _encode(self, texts: List[str]) -> np.ndarray:
+        """L2-normalized embeddings: local MiniLM when installed, else the OpenAI embeddings API"""
+        if SentenceTransformer is not None:
+            return await asyncio.to_thread(_local_encoder().encode, texts, normalize_embeddings=True)
+        async with llm_semaphore():
+            vectors = np.asarray(await self.embeddings.aembed_documents(texts), dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
     
-    def parse_slides(self, content: str) -> List[SlideContent]:
-        """Parse the slide content using the specific format"""
+    async def _embed_explanations(self, texts: List[str]):
+        """Make sure every text has an L2-normalized embedding, embedding only unseen ones"""
+        missing = [text for text in dict.fromkeys(texts) if text not in self._explanation_vectors]
+        if missing:
+            for text, vector in zip(missing, await self._encode(missing)):
+                self._explanation_vectors[text] = vector
+        
+        # Forget candidates that were rejected and never became previous explanations
+        if len(self._explanation_vectors) > 2 * self.MAX_PREVIOUS_EXPLANATIONS:
+            wanted = set(texts).union(self.previous_explanations)
+            for text in [t for t in self._explanation_vectors if t not in wanted]:
+                del self._explanation_vectors[text]
+    
+    def _previous_matrix(self) -> np.ndarray:
+        """(N, D) matrix of the previous explanations' embeddings, restacked only when they change
+        
+        A turn scores several candidates against the same previous explanations, so the
+        contiguous matrix is reused for one matmul per candidate. Callers embed first.
+        """
+        previous = tuple(self.previous_explanations)
+        if previous != self._previous_rows:  # element identity makes this cheap when unchanged
+            self._previous_vectors = np.stack([self._explanation_vectors[text] for text in previous])
+            self._previous_rows = previous
+        return self._previous_vectors
+    
+    def parse_slides(self, content: Union[str, Iterable[str]]) -> List[SlideContent]:
+        """Parse the slide content using the specific format
+        
+        Accepts the whole text or an iterable of newline-terminated lines (e.g. an
+        open file). Pages are found with one regex scan rather than a per-line loop.
+        """
+        if not isinstance(content, str):
+            content = ''.join(content)
+        if '\r' in content:
+            content = content.replace('\r\n', '\n').replace('\r', '\n')
+        
         pages = []
-        current_page = None
-        current_content = []
-        
-        for line in content.split('\n'):
-            if line.startswith('Page '):
-                if current_page is not None:
-                    pages.append({
-                        'page_number': current_page,
-                        'content': '\n'.join(current_content).strip()
-                    })
-                current_page = int(line.split(':')[0].split()[1])
-                current_content = []
-            elif line.strip() == 'Text content:':
-                continue
-            else:
-                current_content.append(line)
+        for page, start, end in _page_spans(list(_PAGE_HEADER.finditer(content)), len(content)):
+            body = content[start:end]
+            if 'Text content:' in body:
+                body = _TEXT_CONTENT_LINE.sub('', body)
+            pages.append(SlideContent(page, body.strip()))
+        return pages
+    
+    def load_slides(self, filename: str) -> Sequence[SlideContent]:
+        """Read and parse a slide file, reusing the last parse while the file is unchanged
+        
+        The file is memory-mapped rather than read into a str, so large decks are
+        not held in memory twice while parsing.
+        """
+        return self._load_slide_file(filename)[1]
+    
+    def load_slide_index(self, filename: str) -> Mapping[int, SlideContent]:
+        """Like load_slides, but keyed by page number for O(1) page lookups"""
+        return self._load_slide_file(filename)[2]
+    
+    def _load_slide_file(self, filename: str):
+        st = os.stat(filename)
+        key = (st.st_mtime_ns, st.st_size)
+        with _slide_cache_lock:
+            cached = _slide_cache.get(filename)
+            if cached is not None and cached[0] == key:
+                _slide_cache.move_to_end(filename)
+                return cached
+        
+        # Parsed outside the lock; two concurrent misses both parse and the last one is kept
+        slides = tuple(self._parse_slide_file(filename)) if st.st_size else ()
+        index = MappingProxyType({slide.page_number: slide for slide in slides})
+        if len(index) != len(slides):
+            # Catch malformed decks at load time instead of silently dropping pages
+            print(f"Warning: {filename} repeats page numbers; the last occurrence of each is used")
+        cached = (key, slides, index)
+        with _slide_cache_lock:
+            _slide_cache[filename] = cached
+            _slide_cache.move_to_end(filename)
+            if len(_slide_cache) > _SLIDE_CACHE_SIZE:
+                _slide_cache.popitem(last=False)
+        return cached
+    
+    @staticmethod
+    def _parse_slide_file(filename: str) -> List[SlideContent]:
+        """parse_slides over a memory-mapped file, decoding only each page's content bytes"""
+        pages = []
+        with open(filename, 'rb') as file, \
+                mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # re scans the mapping directly; only page bodies are copied out and decoded
+            for page, start, end in _page_spans(list(_PAGE_HEADER_BYTES.finditer(mm)), len(mm)):
+                body = mm[start:end]
+                if b'Text content:' in body:
+                    body = _TEXT_CONTENT_LINE_BYTES.sub(b'', body)
+                content = body.decode('utf-8')
+                if '\r' in content:
+                    # Same normalization as parse_slides: two C-level passes, no per-line list,
+                    # and other characters splitlines() treats as breaks (\f, \u2028...) are kept
+                    content = content.replace('\r\n', '\n').replace('\r', '\n')
+                pages.append(SlideContent(page, content.strip()))
         
-        if current_page is not None:
-            pages.append({
-                'page_number': current_page,
-                'content': '\n'.join(current_content).strip()
-            })
-            
         return pages
 
+    async def warm_up(self):
+        """Open the OpenAI connection (DNS + TLS) before the first real request"""
+        try:
+            await self.llm.root_async_client.models.list()
+        except Exception:
+            # Best effort only: the first LLM call simply pays the handshake instead
+            pass
+
+    async def _stream_json(self, schema: type, messages: List[Any],
+                           stream_fields: Sequence[str] = (),
+                           on_token: Optional[Callable[[str, str], None]] = None,
+                           model: Optional[str] = None, temperature: Optional[float] = None,
+                           on_field_end: Optional[Callable[[str, str], None]] = None) -> Dict[str, Any]:
+        """Stream a JSON response, forwarding selected string fields to on_token as they arrive
+        
+        model and temperature default to the explanation LLM's. on_field_end gets each
+        selected field's full text once it closes, while the rest of the object is still
+        being generated.
+        
+        Goes straight to the OpenAI SDK client: this is the per-turn hot path, and a
+        single-turn streamed completion needs none of LangChain's message conversion,
+        callbacks or tracing.
+        """
+        streamer = (_JsonFieldStreamer(stream_fields, on_token, on_field_end)
+                    if (on_token or on_field_end) and stream_fields else None)
+        chunks = []
+        async with llm_semaphore():
+            stream = await self.llm.root_async_client.chat.completions.create(
+                model=model or self.llm.model_name,
+                temperature=self.llm.temperature if temperature is None else temperature,
+                messages=_to_openai_messages(messages),
+                response_format=_json_schema_format(schema),
+                extra_body=self._cache_routing,
+                stream=True
+            )
+            async for chunk in stream:
+                text = chunk.choices[0].delta.content if chunk.choices else None
+                if text:
+                    chunks.append(text)
+                    if streamer:
+                        streamer.feed(text)
+        return schema.model_validate_json("".join(chunks)).model_dump()
+
     async def ensure_teaching_assistant(self):
         """Ensure teaching assistant is initialized"""
-        if self.teaching_assistant is None:
-            self.teaching_assistant = AITeachingAssistant(self.name)
-        return self.teaching_assistant
+        if self._teaching_assistant is None:
+            self._teaching_assistant = AITeachingAssistant(self.name)
+        return self._teaching_assistant
 
-    async def evaluate_understanding(self, slide_content: str, student_response: str) -> Dict[str, Any]:
-        """Evaluate student's understanding and decide next steps"""
+    async def evaluate_understanding(self, slide_content: str, student_response: str,
+                                     on_token: Optional[Callable[[str, str], None]] = None) -> Dict[str, Any]:
+        """
+        Evaluate student's understanding and decide next steps
+        
+        If on_token is given, the feedback text is streamed to it as it is generated.
+        
+        An answer that paraphrases one already evaluated on this slide (for this
+        professor, in any session) reuses that whole evaluation, including its
+        recommended_action and reasoning, which were decided against the other
+        session's conversation context.
+        """
         try:
             # Ensure teaching assistant is available
             teaching_assistant = await self.ensure_teaching_assistant()
@@ -139,42 +964,33 @@ class AIProfessor:
             # Add student response to conversation history
             self.add_to_conversation_history("Student", student_response)
             
-            messages = [
-                SystemMessage(content=f"""{self.profile}
-                
-                Evaluate the student's response to the slide content and provide:
-                1. Feedback on their understanding
-                2. Recommendation to stay or move to next slide
-                3. Reasoning for your decision
-                
-                Previous Conversation Context:
-                {self.get_conversation_context()}
-                
-                Respond with a JSON object containing these details."""),
-                
-                HumanMessage(content=f"""Slide Content:
-                {slide_content}
-                
-                Student Response:
-                {student_response}
-                
-                Respond with this exact structure:
-                {{
-                    "understanding_assessment": {{
-                        "level": "low/medium/high",
-                        "feedback": "detailed explanation of student's understanding",
-                        "areas_to_improve": ["area 1", "area 2"]
-                    }},
-                    "recommended_action": "stay/next",
-                    "reasoning": "explanation of why to stay or move"
-                }}""")
-            ]
-            
-            response = await self.llm.ainvoke(messages)
-            understanding = json.loads(response.content)
+            # A paraphrase of an answer already evaluated on this slide reuses that evaluation
+            understanding, response_vector = await self._similar_evaluation(slide_content, student_response)
+            if understanding is not None:
+                if on_token:
+                    on_token("feedback", understanding['understanding_assessment']['feedback'])
+            else:
+                messages = [
+                    # Static profile first so OpenAI can reuse its cached prefix across turns
+                    PROFESSOR_SYSTEM_MSGS[self.name],
+                    
+                    SystemMessage(content=_EVAL_CONTEXT_TEMPLATE.substitute(context=self.get_conversation_context())),
+                    
+                    HumanMessage(content=_EVAL_HUMAN_TEMPLATE.substitute(
+                        slide=_fit_tokens(slide_content, SLIDE_TOKEN_BUDGET, keep_head=True),
+                        response=student_response))
+                ]
+                # Scoring JSON like the other assessment agents: deterministic
+                understanding = await self._stream_json(UnderstandingSchema, messages, ("feedback",), on_token,
+                                                        model=ASSESSMENT_MODEL, temperature=0)
+                task = asyncio.create_task(
+                    self._remember_evaluation(slide_content, student_response, understanding, response_vector)
+                )
+                _BACKGROUND_TASKS.add(task)
+                task.add_done_callback(_BACKGROUND_TASKS.discard)
             
             # Add professor's assessment to conversation history
-            self.add_to_conversation_history("Professor", json.dumps(understanding))
+            self.add_to_conversation_history("Professor", orjson.dumps(understanding).decode())
             
             return understanding
             
@@ -182,63 +998,24 @@ class AIProfessor:
             print(f"Error evaluating student understanding: {e}")
             raise
 
-    async def explain_slide(self, slide_content: str, current_page: int) -> Dict[str, Any]:
-        """Generate professor's explanation for the current slide"""
+    async def explain_slide(self, slide_content: str, current_page: int,
+                            on_token: Optional[Callable[[str, str], None]] = None) -> Dict[str, Any]:
+        """
+        Generate professor's explanation for the current slide
+        
+        If on_token is given, the greeting and explanation text are streamed to it
+        as (field, text) pairs while the response is generated.
+        """
         try:
-            # Prepare context with anti-repetition guidance
-            context_message = f"""{self.profile}
-            
-            IMPORTANT: Avoid repeating previous explanations. 
-            If your explanation is too similar to past explanations, provide a 
-            substantially different approach, such as:
-            - Using a completely different analogy
-            - Focusing on different aspects of the topic
-            - Changing the level of detail
-            - Providing a contrasting perspective
-            
-            Previous Conversation Context:
-            {self.get_conversation_context()}
-            """
-            
-            messages = [
-                SystemMessage(content=context_message),
-                
-                HumanMessage(content=f"""Current slide (Page {current_page}):
-                {slide_content}
-                
-                Respond with this exact structure:
-                {{
-                    "prof_response": {{
-                        "greeting": "optional greeting",
-                        "explanation": "detailed explanation in your teaching style",
-                        "key_points": ["point 1", "point 2"],
-                        "verification_question": "question to check understanding"
-                    }},
-                    "teaching_notes": {{
-                        "difficulty_level": "basic/intermediate/advanced",
-                        "prerequisites": ["prerequisite 1", "prerequisite 2"],
-                        "suggested_exercises": ["exercise 1", "exercise 2"]
-                    }}
-                }}""")
-            ]
-            
-            response = await self.llm.ainvoke(messages)
-            explanation = json.loads(response.content)
+            explanation = await self._take_prefetched_explanation(current_page)
+            if explanation is not None:
+                if on_token:
+                    on_token("greeting", explanation['prof_response'].get('greeting', ''))
+                    on_token("explanation", explanation['prof_response']['explanation'])
+            else:
+                explanation = await self._generate_explanation(slide_content, current_page, on_token)
             
-            # Check for explanation similarity and regenerate if too similar
             explanation_text = explanation['prof_response']['explanation']
-            max_attempts = 3
-            attempt = 0
-            
-            while (self.check_explanation_similarity(explanation_text) and attempt < max_attempts):
-                # If too similar, regenerate with added guidance
-                context_message += "\nPrevious explanation was too similar. Generate a COMPLETELY DIFFERENT explanation."
-                messages[0] = SystemMessage(content=context_message)
-                
-                response = await self.llm.ainvoke(messages)
-                explanation = json.loads(response.content)
-                explanation_text = explanation['prof_response']['explanation']
-                attempt += 1
             
             # Store the explanation to prevent future repetitions
             self.previous_explanations.append(explanation_text)
@@ -253,71 +1030,447 @@ class AIProfessor:
             print(f"Error generating professor response: {e}")
             raise
 
+    def _explanation_messages(self, slide_content: str, current_page: int) -> List[Any]:
+        """Build the prompt asking for a slide explanation"""
+        # Prepare context with anti-repetition guidance
+        context_message = _EXPLAIN_CONTEXT_TEMPLATE.substitute(context=self.get_conversation_context())
+        
+        messages = [
+            # Static profile first so OpenAI can reuse its cached prefix across turns
+            PROFESSOR_SYSTEM_MSGS[self.name],
+            
+            SystemMessage(content=context_message),
+            
+            HumanMessage(content=_EXPLAIN_HUMAN_TEMPLATE.substitute(
+                page=current_page, slide=_fit_tokens(slide_content, SLIDE_TOKEN_BUDGET, keep_head=True)))
+        ]
+        
+        return messages
+
+    def _deck_cache_key(self, slide_content: str, page: int) -> str:
+        """Context-free cache key for explanations pre-generated for a whole deck"""
+        return _EXPLANATION_CACHE.key(f"{self.llm.model_name}:deck", [
+            PROFESSOR_SYSTEM_MSGS[self.name],
+            HumanMessage(content=f"Page {page}:\n{slide_content}")
+        ])
+
+    def _cached_explanation(self, cache_key: str, slide_content: str, page: int) -> Optional[Dict[str, Any]]:
+        """Look up an explanation for this exact prompt, then one pre-generated for the deck"""
+        explanation = _EXPLANATION_CACHE.get(cache_key)
+        if explanation is None:
+            explanation = _EXPLANATION_CACHE.get(self._deck_cache_key(slide_content, page))
+        return explanation
+
+    async def batch_generate_deck(self, slides: Sequence[SlideContent],
+                                  poll_interval: float = 60.0) -> Dict[int, Dict[str, Any]]:
+        """
+        Pre-generate explanations for a whole deck through the OpenAI Batch API
+        
+        Batch requests cost half as much but complete asynchronously (within 24h),
+        so this is for preparing a lecture ahead of time, not for a live student.
+        Results are stored in the explanation cache, where explain_slide and the
+        prefetcher find them.
+        
+        Returns:
+            Dict mapping page number to the parsed explanation
+        """
+        client = self.llm.root_async_client
+        by_page = {slide.page_number: slide for slide in slides}
+        
+        # Pages already in the cache (e.g. from an earlier run) are not paid for again
+        cached = await asyncio.to_thread(lambda: {
+            page: explanation for page, slide in by_page.items()
+            if (explanation := _EXPLANATION_CACHE.get(self._deck_cache_key(slide.content, page))) is not None
+        })
+        by_page = {page: slide for page, slide in by_page.items() if page not in cached}
+        if not by_page:
+            return cached
+        
+        lines = []
+        for page, slide in by_page.items():
+            messages = self._explanation_messages(slide.content, page)
+            lines.append(orjson.dumps({
+                "custom_id": f"page-{page}",
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": self.llm.model_name,
+                    "temperature": self.llm.temperature,
+                    "messages": _to_openai_messages(messages),
+                    "response_format": _json_schema_format(ExplanationSchema),
+                    **self._cache_routing
+                }
+            }))
+        
+        batch_file = await client.files.create(file=("deck.jsonl", b"\n".join(lines)), purpose="batch")
+        batch = await client.batches.create(input_file_id=batch_file.id,
+                                            endpoint="/v1/chat/completions",
+                                            completion_window="24h")
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            await asyncio.sleep(poll_interval)
+            batch = await client.batches.retrieve(batch.id)
+        
+        if not batch.output_file_id:
+            raise RuntimeError(f"Deck batch {batch.id} finished with status {batch.status}")
+        
+        output = await client.files.content(batch.output_file_id)
+        explanations = cached
+        for line in output.text.splitlines():
+            if not line.strip():
+                continue
+            result = orjson.loads(line)
+            page = int(result['custom_id'].removeprefix("page-"))
+            try:
+                content = result['response']['body']['choices'][0]['message']['content']
+                explanation = ExplanationSchema.model_validate_json(content).model_dump()
+            except Exception as e:
+                print(f"Skipping batch result for page {page}: {e}")
+                continue
+            explanations[page] = explanation
+            await asyncio.to_thread(_EXPLANATION_CACHE.set,
+                                    self._deck_cache_key(by_page[page].content, page), explanation)
+        
+        return explanations
+
+    async def _generate_explanation(self, slide_content: str, current_page: int,
+                                    on_token: Optional[Callable[[str, str], None]] = None) -> Dict[str, Any]:
+        """Ask the LLM for a slide explanation, regenerating while it repeats earlier ones"""
+        messages = self._explanation_messages(slide_content, current_page)
+        
+        # Identical prompts from earlier sessions are answered from the disk cache
+        cache_key = _EXPLANATION_CACHE.key(self.llm.model_name, messages)
+        explanation = _EXPLANATION_CACHE.peek(cache_key)
+        if explanation is None:
+            explanation = await asyncio.to_thread(self._cached_explanation, cache_key,
+                                                  slide_content, current_page)
+        
+        embedding: List[asyncio.Task] = []
+        cache_hit = explanation is not None
+        if cache_hit:
+            if on_token:
+                on_token("greeting", explanation['prof_response'].get('greeting', ''))
+                on_token("explanation", explanation['prof_response']['explanation'])
+        else:
+            def on_field_end(field: str, text: str):
+                # Embed the finished explanation for the similarity check while the
+                # model is still writing the key points and verification question
+                if field == "explanation" and len(self.previous_explanations) >= 2:
+                    embedding.append(asyncio.create_task(
+                        self._embed_explanations([*self.previous_explanations, text])))
+            
+            stream_fields = ("greeting", "explanation")
+            explanation = await self._stream_json(ExplanationSchema, messages,
+                                                  stream_fields, on_token, on_field_end=on_field_end)
+            await asyncio.to_thread(_EXPLANATION_CACHE.set, cache_key, explanation)
+        
+        # With fewer than two earlier explanations a fresh one rarely needs regenerating, but
+        # a cached one may be the very explanation just given (e.g. a "stay" on this page)
+        if self.previous_explanations and (cache_hit or len(self.previous_explanations) >= 2):
+            if embedding:
+                await asyncio.gather(*embedding, return_exceptions=True)
+            explanation = await self._regenerate_while_repetitive(messages, explanation, on_token)
+        
+        # Keep the final explanation for this slide so revisits and later sessions can reuse it
+        task = asyncio.create_task(
+            self._remember_slide_explanation(slide_content, current_page, explanation)
+        )
+        _BACKGROUND_TASKS.add(task)
+        task.add_done_callback(_BACKGROUND_TASKS.discard)
+        return explanation
+
+    async def _regenerate_while_repetitive(self, messages: List[Any], explanation: Dict[str, Any],
+                                           on_token: Optional[Callable[[str, str], None]] = None) -> Dict[str, Any]:
+        """Replace an explanation that is too similar to earlier ones, within budget
+        
+        Each regeneration asks for several candidates in one request and keeps the
+        first that is distinct enough, or otherwise the least repetitive one seen.
+        """
+        similarity, limit = await self._max_similarity(explanation['prof_response']['explanation'])
+        if similarity <= limit:
+            return explanation
+        
+        best_margin, best = similarity - limit, explanation
+        max_attempts = 2
+        deadline = time.monotonic() + self.regeneration_budget
+        
+        for attempt in range(max_attempts):
+            if time.monotonic() > deadline:
+                break
+            
+            # If too similar, regenerate with added guidance; appended as a trailing
+            # message so the whole earlier prompt stays a cacheable prefix
+            messages.append(SystemMessage(content=
+                "Previous explanation was too similar. Generate a COMPLETELY DIFFERENT explanation."))
+            try:
+                candidates = await self._explanation_candidates(messages, self.retry_candidates)
+            except Exception as e:
+                print(f"Error regenerating explanation: {e}")
+                break
+            
+            texts = [candidate['prof_response']['explanation'] for candidate in candidates]
+            try:
+                # One embeddings request for all candidates; scoring below then hits the cache
+                await self._embed_explanations([*self.previous_explanations, *texts])
+            except Exception:
+                pass
+            for candidate, text in zip(candidates, texts):
+                similarity, limit = await self._max_similarity(text)
+                if similarity - limit < best_margin:
+                    best_margin, best = similarity - limit, candidate
+                if best_margin <= 0:
+                    break
+            
+            # Accept once distinct enough, or nearly so after a retry has already improved it
+            if best_margin <= 0.05:
+                break
+        
+        if best is not explanation:
+            best = ExplanationSchema.model_validate(best).model_dump()
+            if on_token:
+                on_token("retry", "\n\nActually, let me explain that a different way.\n\n")
+                on_token("explanation", best['prof_response']['explanation'])
+        return best
+
+    async def _explanation_candidates(self, messages: List[Any], n: int) -> List[Dict[str, Any]]:
+        """Sample n explanations in a single request (shared prefill, one round trip)
+        
+        Candidates are returned unvalidated; callers validate the one they keep.
+        """
+        async with llm_semaphore():
+            response = await self.llm.root_async_client.chat.completions.create(
+                model=self.llm.model_name,
+                temperature=self.llm.temperature,
+                n=n,
+                messages=_to_openai_messages(messages),
+                response_format=_json_schema_format(ExplanationSchema),
+                extra_body=self._cache_routing
+            )
+        # Plain orjson parses: most candidates are only scored and then discarded, so
+        # schema validation is deferred to the one that is kept
+        return [orjson.loads(choice.message.content) for choice in response.choices]
+
+    async def _remember_slide_explanation(self, slide_content: str, page: int, explanation: Dict[str, Any]):
+        """Store the explanation under the (professor, page, slide) key"""
+        await asyncio.to_thread(_EXPLANATION_CACHE.set, self._deck_cache_key(slide_content, page), explanation)
+
+    async def _similar_evaluation(self, slide_content: str, student_response: str
+                                  ) -> Tuple[Optional[Dict[str, Any]], Optional[np.ndarray]]:
+        """Earlier evaluation of a near-identical answer on this slide, and the answer's vector
+        
+        The match ignores conversation context, so the returned stay/next decision is
+        the one made for the earlier answer's session.
+        """
+        entries = _EVALUATION_INDEX.get((self.name, slide_content))
+        if not entries:
+            return None, None
+        try:
+            response_vector = (await self._encode([student_response]))[0]
+        except Exception as e:
+            print(f"Error looking up similar evaluations: {e}")
+            return None, None
+        _EVALUATION_INDEX.move_to_end((self.name, slide_content))
+        similarities = np.stack([vector for vector, _ in entries]) @ response_vector
+        best = int(similarities.argmax())
+        if similarities[best] < self.evaluation_match_threshold:
+            return None, response_vector
+        return copy.deepcopy(entries[best][1]), response_vector
+
+    async def _remember_evaluation(self, slide_content: str, student_response: str,
+                                   understanding: Dict[str, Any], response_vector: Optional[np.ndarray] = None):
+        """Index the evaluation of this answer for later paraphrased answers on the same slide"""
+        try:
+            if response_vector is None:
+                response_vector = (await self._encode([student_response]))[0]
+        except Exception as e:
+            print(f"Error indexing evaluation for similar-answer lookup: {e}")
+            return
+        key = (self.name, slide_content)
+        entries = _EVALUATION_INDEX.get(key)
+        if entries is None:
+            entries = _EVALUATION_INDEX[key] = deque(maxlen=_EVALUATIONS_PER_SLIDE)
+        entries.append((response_vector, copy.deepcopy(understanding)))
+        _EVALUATION_INDEX.move_to_end(key)
+        if len(_EVALUATION_INDEX) > _EVALUATION_INDEX_SIZE:
+            _EVALUATION_INDEX.popitem(last=False)
+
+    def prefetch_explanation(self, slide_content: str, page: int,
+                             limit: Optional[asyncio.Semaphore] = None):
+        """Speculatively start generating the explanation for a page in the background
+        
+        At most `limit` prefetches (default: the process-wide _PREFETCH_SEMAPHORE) run
+        at once; the LLM calls themselves also count against llm_semaphore.
+        """
+        if page in self._prefetched_explanations:
+            return
+        
+        async def _prefetch():
+            async with limit or _PREFETCH_SEMAPHORE:
+                _QUEUED_PREFETCHES.discard(task)
+                return await self._generate_explanation(slide_content, page)
+        
+        task = self._prefetched_explanations[page] = asyncio.create_task(_prefetch())
+        _QUEUED_PREFETCHES.add(task)
+
+    def detach_prefetched_explanation(self, page: int) -> Optional[asyncio.Future]:
+        """Hand over a pending prefetch (e.g. to the next API request) instead of cancelling it"""
+        return self._prefetched_explanations.pop(page, None)
+
+    def adopt_prefetched_explanation(self, page: int, future: asyncio.Future):
+        """Use a prefetch started by another instance; explain_slide re-checks it for repetition"""
+        self._prefetched_explanations.setdefault(page, future)
+
+    async def prefetch_explanations(self, slides: Mapping[int, SlideContent], start_page: int, k: int = 5):
+        """Generate explanations for the next k pages with a single batched LLM call
+        
+        slides is a page-number index (see load_slide_index), so only the k
+        requested pages are looked at rather than the whole deck.
+        """
+        pending = [slides[page] for page in range(start_page, start_page + k)
+                   if page in slides and page not in self._prefetched_explanations]
+        if not pending:
+            return
+        
+        # Register futures first so explain_slide waits for the batch instead of duplicating it
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in pending]
+        for slide, future in zip(pending, futures):
+            self._prefetched_explanations[slide.page_number] = future
+        
+        prompts = [self._explanation_messages(slide.content, slide.page_number) for slide in pending]
+        cache_keys = [_EXPLANATION_CACHE.key(self.llm.model_name, messages) for messages in prompts]
+        cached = await asyncio.to_thread(lambda: [
+            self._cached_explanation(key, slide.content, slide.page_number)
+            for key, slide in zip(cache_keys, pending)
+        ])
+        
+        # Only the cache misses go to the model
+        misses = [i for i, explanation in enumerate(cached) if explanation is None]
+        async def _invoke(prompt):
+            # Each request takes its own slot so a batch counts fully against the global cap
+            async with llm_semaphore():
+                return await self.explanation_llm.ainvoke(prompt)
+        
+        results = await asyncio.gather(*(_invoke(prompts[i]) for i in misses), return_exceptions=True)
+        
+        for i, result in zip(misses, results):
+            try:
+                if isinstance(result, Exception):
+                    raise result
+                cached[i] = ExplanationSchema.model_validate_json(result.content).model_dump()
+                await asyncio.to_thread(_EXPLANATION_CACHE.set, cache_keys[i], cached[i])
+            except Exception as e:
+                cached[i] = e
+        
+        for future, result in zip(futures, cached):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def _take_prefetched_explanation(self, page: int) -> Optional[Dict[str, Any]]:
+        """Consume a prefetched explanation, or None if missing, failed or now too repetitive"""
+        future = self._prefetched_explanations.pop(page, None)
+        if future is None:
+            return None
+        if future in _QUEUED_PREFETCHES:
+            # Never started: generating now beats waiting for a free prefetch slot
+            future.cancel()
+            return None
+        try:
+            explanation = await future
+        except Exception as e:
+            print(f"Prefetched explanation for page {page} failed: {e}")
+            return None
+        # Other explanations may have been given since the prefetch started
+        if await self.check_explanation_similarity(explanation['prof_response']['explanation']):
+            return None
+        return explanation
+
+    def cancel_prefetches(self):
+        """Drop any speculative explanations that were never used"""
+        if self._prefetch_batch is not None:
+            self._prefetch_batch.cancel()
+            self._prefetch_batch = None
+        for future in self._prefetched_explanations.values():
+            if future.done() and not future.cancelled():
+                future.exception()  # mark as retrieved so unused failures aren't logged
+            future.cancel()
+        self._prefetched_explanations.clear()
+
     async def process_interaction(self, filename: str, current_page: int) -> None:
         try:
-            # Read the file
-            with open(filename, 'r', encoding='utf-8') as file:
-                content = file.read()
-            
-            # Parse slides
-            slides = self.parse_slides(content)
+            # Read and parse slides off the event loop
+            slides = await asyncio.to_thread(self.load_slides, filename)
             self.max_pages = len(slides)
+            self._page_index = self.load_slide_index(filename)  # parse is cached by now
             self.current_page = current_page
             
             # Reset conversation history for this session
             self.conversation_history = []
             self.previous_explanations = []
+            if self.teaching_assistant is not None:
+                self.teaching_assistant.reset()
             
             # Add initial context to conversation history
             self.add_to_conversation_history("System", f"Starting lecture with Professor {self.name}")
             
+            _start_log_writer()
+            
+            # Batch-generate the upcoming pages while the first one is explained live
+            self._prefetch_batch = asyncio.create_task(
+                self.prefetch_explanations(self._page_index, self.current_page + 1)
+            )
+            
             continue_session = True
             while continue_session:
                 # Find current slide
-                current_slide = next((slide for slide in slides 
-                                    if slide['page_number'] == self.current_page), None)
+                current_slide = self._page_index.get(self.current_page)
                 
                 if not current_slide:
-                    print(f"\nPage {self.current_page} not found in slides")
+                    _log(f"\nPage {self.current_page} not found in slides")
                     break
                 
-                # Get professor's explanation
-                response = await self.explain_slide(current_slide['content'], self.current_page)
-                
-                # Print professor's response
-                print(f"\n=== Professor {self.name}'s Response (Page {self.current_page}/{self.max_pages}) ===")
-                print(f"\n{response['prof_response'].get('greeting', '')}")
-                print(f"\nExplanation:\n{response['prof_response']['explanation']}")
-                
-                print("\nKey Points:")
-                for point in response['prof_response']['key_points']:
-                    print(f"- {point}")
-                
-                print(f"\nTo verify your understanding:\n{response['prof_response']['verification_question']}")
-                
-                # Get user's response
-                student_response = input("\nYour answer: ").strip()
+                # Stream professor's explanation as it is generated
+                _log(f"\n=== Professor {self.name}'s Response (Page {self.current_page}/{self.max_pages}) ===\n")
+                response = await self.explain_slide(current_slide.content, self.current_page,
+                                                    on_token=_stream_printer({"explanation": "\n\nExplanation:\n"}))
+                _log("\n" + _render_explanation_footer(response))
                 
-                # Evaluate student's understanding
-                understanding = await self.evaluate_understanding(current_slide['content'], student_response)
+                # Speculatively explain the next slide while the student thinks
+                next_slide = self._page_index.get(self.current_page + 1)
+                if next_slide:
+                    self.prefetch_explanation(next_slide.content, self.current_page + 1)
                 
-                # Print professor's feedback
-                print("\nProfessor's Feedback:")
-                print(f"Understanding Level: {understanding['understanding_assessment']['level']}")
-                print(f"Detailed Feedback: {understanding['understanding_assessment']['feedback']}")
+                # Get user's response without blocking the event loop
+                await _flush_logs()
+                student_response = await _ainput("\nYour answer: ")
                 
-                print("\nAreas to Improve:")
-                for area in understanding['understanding_assessment']['areas_to_improve']:
-                    print(f"- {area}")
+                # Evaluate student's understanding, streaming the feedback
+                _log("\nProfessor's Feedback:\nDetailed Feedback: ", end="")
+                evaluation = self.evaluate_understanding(current_slide.content, student_response,
+                                                         on_token=_stream_printer())
+                if self.teaching_assistant is not None:
+                    # The TA's quiz assessment runs alongside; gather starts the evaluation
+                    # first, so the student's answer is already in the shared history
+                    understanding, quiz_assessment = await asyncio.gather(
+                        evaluation,
+                        self.teaching_assistant.assess_concept_understanding(
+                            self.conversation_history, current_slide.content
+                        )
+                    )
+                else:
+                    understanding, quiz_assessment = await evaluation, None
+                _log("\n" + _render_assessment(understanding))
                 
-                print(f"\nRecommended Action: {understanding['recommended_action']}")
-                print(f"Reasoning: {understanding['reasoning']}")
-                
-                # Check if a quiz should be triggered
+                # Check if a quiz should be triggered (it prints directly)
+                await _flush_logs()
                 quiz_result = await run_quiz_interaction(
                     self.teaching_assistant, 
                     self, 
-                    current_slide
+                    current_slide,
+                    understanding_assessment=quiz_assessment
                 )
                 
                 # Determine next action based on understanding assessment
@@ -326,10 +1479,14 @@ class AIProfessor:
                 
                 # Check if we've reached the last page
                 continue_session = self.current_page <= self.max_pages
+            
+            await _flush_logs()
                 
         except Exception as e:
             print(f"\nUnexpected error: {str(e)}")
             raise
+        finally:
+            self.cancel_prefetches()
 
     async def chat(self, message: str, current_page: int):
         if not self.teaching_assistant:
@@ -341,29 +1498,77 @@ class AIProfessor:
         )
         return response
 
+def _render_explanation_footer(response: Dict[str, Any]) -> str:
+    """Key points and verification question as one block, written with a single _log call"""
+    prof_response = response['prof_response']
+    lines = ["\nKey Points:"]
+    lines.extend(f"- {point}" for point in prof_response['key_points'])
+    lines.append(f"\nTo verify your understanding:\n{prof_response['verification_question']}")
+    return "\n".join(lines)
+
+def _render_assessment(understanding: Dict[str, Any]) -> str:
+    """Understanding level, areas to improve and recommendation as one block"""
+    assessment = understanding['understanding_assessment']
+    lines = [f"Understanding Level: {assessment['level']}", "\nAreas to Improve:"]
+    lines.extend(f"- {area}" for area in assessment['areas_to_improve'])
+    lines.append(f"\nRecommended Action: {understanding['recommended_action']}")
+    lines.append(f"Reasoning: {understanding['reasoning']}")
+    return "\n".join(lines)
+
+def _stream_printer(headers: Optional[Dict[str, str]] = None) -> Callable[[str, str], None]:
+    """Build an on_token callback that queues streamed text, printing a header when a field starts"""
+    headers = headers or {}
+    last_field = None
+    
+    def on_token(field: str, text: str):
+        nonlocal last_field
+        if field != last_field:
+            last_field = field
+            _log(headers.get(field, ""), end="")
+        _log(text, end="")
+    return on_token
+
 async def main():
+    _start_log_writer()
+    # Startup work overlapped with the prompts; awaited or cancelled before returning
+    startup_tasks: List[asyncio.Task] = []
     try:
-        print("\nWelcome to the AI Professor System!")
-        print("\nAvailable Professors:")
-        for name in PROFESSOR_PROFILES:
-            print(f"- {name}")
+        # One queued block per screen rather than one write per line
+        _log("\n".join(["\nWelcome to the AI Professor System!", "\nAvailable Professors:",
+                         *(f"- {name}" for name in PROFESSOR_PROFILES)]))
         
-        professor_name = input("\nPlease choose your professor: ").strip()
+        await _flush_logs()
+        professor_name = await _ainput("\nPlease choose your professor: ")
         if professor_name not in PROFESSOR_PROFILES:
             raise ValueError(f"Invalid professor name. Choose from: {', '.join(PROFESSOR_PROFILES.keys())}")
         
         professor = AIProfessor(professor_name)
         
-        filename = input("Enter the filename containing slides: ").strip()
-        current_page = int(input("Enter the page number to discuss: ").strip())
+        # Warm the connection pool while the user is typing
+        startup_tasks.append(asyncio.create_task(professor.warm_up()))
+        
+        filename = await _ainput("Enter the filename containing slides: ")
+        # Read and parse the deck on a worker thread while the user types the page
+        # number; process_interaction then gets it from the parse cache
+        startup_tasks.append(asyncio.create_task(asyncio.to_thread(professor.load_slides, filename)))
+        current_page = int(await _ainput("Enter the page number to discuss: "))
+        await asyncio.gather(*startup_tasks)
         
         await professor.process_interaction(filename, current_page)
         
-        print("\nThank you for attending the session!")
+        _log("\nThank you for attending the session!")
+        await _flush_logs()
         
     except Exception as e:
+        await _flush_logs()
         print(f"An error occurred: {str(e)}")
         raise
+    finally:
+        # e.g. a non-numeric page number raises before the gather above
+        for task in startup_tasks:
+            task.cancel()
+        await asyncio.gather(*startup_tasks, return_exceptions=True)
+        await close_shared_async_http_client()
 
 if __name__ == "__main__":
     setup_environment()
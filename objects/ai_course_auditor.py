@@ -1,11 +1,15 @@
 from typing import Dict, List, Any, Optional
 from langchain_openai import ChatOpenAI
 from langchain.schema import HumanMessage, SystemMessage
-import json
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import BaseModel, ValidationError
+from http_client import shared_async_http_client, llm_semaphore, llm_max_retries
+import orjson
+import asyncio
+import functools
 import statistics
 from datetime import datetime
 import logging
-from json.decoder import JSONDecodeError
 
 # Configure logging
 logging.basicConfig(
@@ -26,15 +30,80 @@ class MetricsCalculationError(AuditorError):
     """Raised when metrics calculation fails"""
     pass
 
+# --- Structured Output Schemas ---
+class EngagementMetrics(BaseModel):
+    participation_rate: float
+    response_quality: float
+    question_asking_frequency: float
+
+class UnderstandingProgression(BaseModel):
+    initial_level: float
+    final_level: float
+    key_improvements: List[str]
+    challenging_areas: List[str]
+
+class LearningPatterns(BaseModel):
+    preferred_learning_style: str
+    most_effective_topics: List[str]
+    attention_span: str
+
+class ConversationAnalysis(BaseModel):
+    engagement_metrics: EngagementMetrics
+    understanding_progression: UnderstandingProgression
+    learning_patterns: LearningPatterns
+
+class AuditRecommendations(BaseModel):
+    key_strengths: List[str]
+    improvement_areas: List[str]
+    action_items: List[str]
+    additional_resources: List[str]
+
+# Static system prompts, built once so every call sends the identical message
+_ANALYSIS_SYSTEM_MSG = SystemMessage(content="""You are an expert Course Auditor.
+                Analyze the entire conversation history to:
+                1. Evaluate student engagement and participation
+                2. Assess concept understanding progression
+                3. Identify strengths and areas for improvement
+                4. Provide specific, actionable recommendations
+                
+                Focus on both quantitative and qualitative aspects.""")
+
+_RECOMMENDATIONS_SYSTEM_MSG = SystemMessage(content="""You are an expert Course Auditor.
+                Based on the student's performance metrics and learning patterns,
+                provide specific recommendations for improvement.""")
+
+def _batch_request(model: str, schema: type, messages: List[Any]) -> bytes:
+    """One Batch API JSONL line asking for a strict json_schema reply"""
+    function = convert_to_openai_tool(schema, strict=True)["function"]
+    return orjson.dumps({
+        "custom_id": schema.__name__,
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": {
+            "model": model,
+            "temperature": 0,
+            "messages": [
+                {"role": "system" if isinstance(m, SystemMessage) else "user", "content": m.content}
+                for m in messages
+            ],
+            "response_format": {
+                "type": "json_schema",
+                "json_schema": {"name": function["name"], "strict": True, "schema": function["parameters"]},
+            },
+        },
+    })
+
 class CourseAuditor:
-    def __init__(self):
-        """Initialize the Course Auditor with necessary components"""
+    def __init__(self, use_batch: bool = False, poll_interval: float = 60.0):
+        """Initialize the Course Auditor with necessary components
+
+        Args:
+            use_batch: Send the report's LLM calls through the Batch API. Reports are read
+                after the session, so trading latency (up to 24h) for half-price tokens is fine.
+            poll_interval: Seconds between batch status checks
+        """
         try:
-            self.llm = ChatOpenAI(
-                temperature=0.7,
-                model="gpt-4o-mini",
-                streaming=False
-            )
+            self.llm, self.analysis_llm, self.recommendations_llm = self._shared_llms()
         except Exception as e:
             logger.error(f"Failed to initialize ChatOpenAI: {str(e)}")
             raise AuditorError(f"LLM initialization failed: {str(e)}")
@@ -46,6 +115,53 @@ class CourseAuditor:
             "concept_understanding": 0.25,
             "progress_rate": 0.15
         }
+        self.use_batch = use_batch
+        self.poll_interval = poll_interval
+
+    @classmethod
+    @functools.cache
+    def _shared_llms(cls):
+        """Build the LLM and its structured-output runnables once per class, not per instance"""
+        # Auditor only emits scoring JSON; no creative generation needed
+        llm = ChatOpenAI(
+            temperature=0,
+            model="gpt-4o-mini",
+            streaming=False,
+            http_async_client=shared_async_http_client(),
+            max_retries=llm_max_retries()
+        )
+        # Strict structured outputs: the API only returns replies matching the schema
+        return (
+            llm,
+            llm.with_structured_output(ConversationAnalysis, method="json_schema", strict=True),
+            llm.with_structured_output(AuditRecommendations, method="json_schema", strict=True),
+        )
+
+    async def _invoke(self, runnable, schema: type, messages: List[Any]) -> BaseModel:
+        """Run a structured-output call, through the Batch API when use_batch is set"""
+        if not self.use_batch:
+            async with llm_semaphore():
+                return await runnable.ainvoke(messages)
+        
+        client = self.llm.root_async_client
+        batch_file = await client.files.create(
+            file=(f"{schema.__name__}.jsonl", _batch_request(self.llm.model_name, schema, messages)),
+            purpose="batch"
+        )
+        batch = await client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            await asyncio.sleep(self.poll_interval)
+            batch = await client.batches.retrieve(batch.id)
+        if not batch.output_file_id:
+            raise AuditorError(f"Batch {batch.id} ended with status {batch.status} and no output")
+        
+        output = await client.files.content(batch.output_file_id)
+        result = orjson.loads(output.text)
+        return schema.model_validate_json(result['response']['body']['choices'][0]['message']['content'])
 
     async def analyze_conversation(self, conversation_history: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
@@ -58,77 +174,33 @@ class CourseAuditor:
             Dict containing comprehensive analysis and evaluation
             
         Raises:
-            AnalysisError: If analysis fails
-            JSONDecodeError: If response parsing fails
+            AnalysisError: If analysis fails or the response does not match the schema
         """
         try:
             if not conversation_history:
                 raise AnalysisError("Empty conversation history provided")
 
             messages = [
-                SystemMessage(content="""You are an expert Course Auditor.
-                Analyze the entire conversation history to:
-                1. Evaluate student engagement and participation
-                2. Assess concept understanding progression
-                3. Identify strengths and areas for improvement
-                4. Provide specific, actionable recommendations
+                _ANALYSIS_SYSTEM_MSG,
                 
-                Focus on both quantitative and qualitative aspects."""),
-                
-                HumanMessage(content=f"""Conversation History:
-                {json.dumps(conversation_history, indent=2)}
-                
-                Provide a detailed analysis following this structure:
-                {{
-                    "engagement_metrics": {{
-                        "participation_rate": float,
-                        "response_quality": float,
-                        "question_asking_frequency": float
-                    }},
-                    "understanding_progression": {{
-                        "initial_level": float,
-                        "final_level": float,
-                        "key_improvements": [str],
-                        "challenging_areas": [str]
-                    }},
-                    "learning_patterns": {{
-                        "preferred_learning_style": str,
-                        "most_effective_topics": [str],
-                        "attention_span": str
-                    }}
-                }}""")
+                # One compact JSON object per line: indentation would repeat on every
+                # entry of a long session and only add input tokens
+                HumanMessage(content="Conversation History:\n" + "\n".join(
+                    orjson.dumps(entry).decode() for entry in conversation_history
+                ))
             ]
             
-            response = await self.llm.ainvoke(messages)
-            
-            # Validate response structure
-            analysis_data = json.loads(response.content)
-            self._validate_analysis_data(analysis_data)
+            # Response structure is validated by the schema-bound runnable
+            analysis = await self._invoke(self.analysis_llm, ConversationAnalysis, messages)
+            return analysis.model_dump()
             
-            return analysis_data
-            
-        except JSONDecodeError as e:
+        except ValidationError as e:
             logger.error(f"Failed to parse LLM response: {str(e)}")
             raise AnalysisError(f"Failed to parse analysis response: {str(e)}")
         except Exception as e:
             logger.error(f"Analysis failed: {str(e)}")
             raise AnalysisError(f"Analysis failed: {str(e)}")
 
-    def _validate_analysis_data(self, data: Dict[str, Any]) -> None:
-        """Validate the structure of analysis data"""
-        required_keys = {
-            "engagement_metrics": ["participation_rate", "response_quality", "question_asking_frequency"],
-            "understanding_progression": ["initial_level", "final_level", "key_improvements", "challenging_areas"],
-            "learning_patterns": ["preferred_learning_style", "most_effective_topics", "attention_span"]
-        }
-        
-        for section, fields in required_keys.items():
-            if section not in data:
-                raise AnalysisError(f"Missing required section: {section}")
-            for field in fields:
-                if field not in data[section]:
-                    raise AnalysisError(f"Missing required field: {section}.{field}")
-
     def calculate_performance_metrics(self, 
                                    conversation_analysis: Dict[str, Any],
                                    quiz_results: List[Dict[str, Any]]) -> Dict[str, float]:
@@ -283,27 +355,17 @@ class CourseAuditor:
         """Generate personalized recommendations based on performance"""
         try:
             messages = [
-                SystemMessage(content="""You are an expert Course Auditor.
-                Based on the student's performance metrics and learning patterns,
-                provide specific recommendations for improvement."""),
+                _RECOMMENDATIONS_SYSTEM_MSG,
                 
                 HumanMessage(content=f"""Performance Metrics:
-                {json.dumps(performance_metrics, indent=2)}
+                {orjson.dumps(performance_metrics, option=orjson.OPT_INDENT_2).decode()}
                 
                 Learning Patterns:
-                {json.dumps(learning_patterns, indent=2)}
-                
-                Provide targeted recommendations in this format:
-                {{
-                    "key_strengths": [str],
-                    "improvement_areas": [str],
-                    "action_items": [str],
-                    "additional_resources": [str]
-                }}""")
+                {orjson.dumps(learning_patterns, option=orjson.OPT_INDENT_2).decode()}""")
             ]
             
-            response = await self.llm.ainvoke(messages)
-            return json.loads(response.content)
+            recommendations = await self._invoke(self.recommendations_llm, AuditRecommendations, messages)
+            return recommendations.model_dump()
             
         except Exception as e:
             logger.error(f"Failed to generate recommendations: {str(e)}")
@@ -331,19 +393,21 @@ class CourseAuditor:
             return "Needs Improvement"
 
 async def generate_audit_report(conversation_history: List[Dict[str, Any]], 
-                              quiz_results: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+                              quiz_results: List[Dict[str, Any]],
+                              use_batch: bool = False) -> Optional[Dict[str, Any]]:
     """
     Convenience function to generate an audit report
     
     Args:
         conversation_history: Complete conversation history
         quiz_results: List of quiz results
+        use_batch: Generate the report through the Batch API (cheaper, not interactive)
         
     Returns:
         Dict containing the audit report or None if generation fails
     """
     try:
-        auditor = CourseAuditor()
+        auditor = CourseAuditor(use_batch=use_batch)
         return await auditor.generate_final_report(conversation_history, quiz_results)
     except Exception as e:
         logger.error(f"Failed to generate audit report: {str(e)}")
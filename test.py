@@ -1,5 +1,8 @@
 import os
+import functools
 from dotenv import load_dotenv
+
+@functools.cache
 def setup_environment():
     """Setup and validate environment variables with debug information"""
     print("Starting environment setup...")
@@ -8,14 +11,9 @@ def setup_environment():
     print(f"Current working directory: {os.getcwd()}")
     
     # Check if .env file exists
+    # Only report presence: printing the file would leak the API keys to stdout
     if os.path.exists('.env'):
         print(".env file found")
-        try:
-            with open('.env', 'r') as f:
-                print("Contents of .env file:")
-                print(f.read())
-        except Exception as e:
-            print(f"Error reading .env file: {e}")
     else:
         print(".env file not found!")
         print("Looking for .env in:", os.getcwd())
@@ -53,4 +51,5 @@ def setup_environment():
     
     print("\nEnvironment setup completed successfully!")
 
-setup_environment()
\ No newline at end of file
+if __name__ == "__main__":
+    setup_environment()
\ No newline at end of file
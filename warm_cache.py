@@ -0,0 +1,35 @@
+import argparse
+import asyncio
+import glob
+
+from main import AIProfessor, PROFESSOR_PROFILES, setup_environment
+from http_client import close_shared_async_http_client
+
+async def warm_cache(filenames, professor_names, poll_interval: float):
+    """Pre-generate explanations for every (professor, deck) pair through the OpenAI Batch API"""
+    async def warm(professor_name: str, filename: str):
+        professor = AIProfessor(professor_name)
+        slides = await asyncio.to_thread(professor.load_slides, filename)
+        try:
+            explanations = await professor.batch_generate_deck(slides, poll_interval=poll_interval)
+            print(f"{professor_name} / {filename}: {len(explanations)}/{len(slides)} pages cached")
+        except Exception as e:
+            print(f"{professor_name} / {filename}: batch failed: {e}")
+    
+    try:
+        # Batches run server-side, so submit them all and wait for them together
+        await asyncio.gather(*(warm(name, filename) for name in professor_names for filename in filenames))
+    finally:
+        await close_shared_async_http_client()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warm the explanation cache for known slide decks at Batch API prices")
+    parser.add_argument("files", nargs="*", help="Slide files (default: processed_content/*.txt)")
+    parser.add_argument("--professor", action="append", choices=list(PROFESSOR_PROFILES),
+                        help="Professor to generate for (repeatable; default: all)")
+    parser.add_argument("--poll-interval", type=float, default=60.0, help="Seconds between batch status checks")
+    args = parser.parse_args()
+    
+    setup_environment()
+    asyncio.run(warm_cache(args.files or sorted(glob.glob("processed_content/*.txt")),
+                           args.professor or list(PROFESSOR_PROFILES), args.poll_interval))